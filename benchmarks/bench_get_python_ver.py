@@ -0,0 +1,34 @@
+"""Compare helpers.get_python_ver() with the platform.architecture() it replaced.
+
+    python benchmarks/bench_get_python_ver.py
+"""
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pssepath import helpers  # noqa: E402
+
+
+def old_get_python_ver():
+    py_ver = "%s.%s" % sys.version_info[:2]
+    return py_ver, platform.architecture()[0]
+
+
+def report(name, fn, number):
+    per_call = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print("%-40s %10.3f us/call" % (name, per_call * 1e6))
+    return per_call
+
+
+def main():
+    assert helpers.get_python_ver() == old_get_python_ver()
+    old = report("platform.architecture() per call", old_get_python_ver, 200)
+    new = report("helpers.get_python_ver()", helpers.get_python_ver, 200000)
+    print("%.0fx faster" % (old / new,))
+
+
+if __name__ == "__main__":
+    main()
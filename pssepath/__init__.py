@@ -5,3 +5,8 @@ from .core import (  # noqa: F401
     print_python_selection,
     select_pssepath,
 )
+from .instrument import instrument_psspy, uninstrument_psspy  # noqa: F401
+from .executor import start_psspy_executor  # noqa: F401
+from .seats import release_licence_seat  # noqa: F401
+from .output import get_output_capture  # noqa: F401
+from .watchdog import get_watchdog, start_watchdog  # noqa: F401
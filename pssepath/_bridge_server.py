@@ -0,0 +1,243 @@
+"""psspy server run by pssepath.bridge in the Python PSSE requires.
+
+    python _bridge_server.py PSSE_VERSION PSSPY_DIR PSSBIN_DIR SHARED_THRESHOLD
+
+This file is run as a script by a different Python version (and possibly
+bitness) than the one using pssepath, so it only uses the standard library
+and runs on Python 2 and 3. It must not import pssepath.
+
+Messages are pickles (protocol 2) read from stdin and written to stdout:
+
+    -> ("call", [(name, args, kwargs), ...])
+    <- ("ok", [("ok", result), ..., ("error", (type, message, traceback))])
+    -> ("close",)
+
+Calls stop at the first error. Lists of at least SHARED_THRESHOLD numbers in
+results, eg. from psspy's array functions, are written to shared memory
+and replaced by (SHARED_TAG, name, typecode, size, row_lengths). The memory
+stays valid until the next message is read. Anything psspy prints goes to
+stderr.
+"""
+import array
+import os
+import pickle
+import sys
+import tempfile
+import traceback
+
+
+PROTOCOL = 2
+SHARED_TAG = "__pssepath_shared__"
+SIMPLE_TYPES = (int, float, str, bool, type(None))
+
+if sys.version_info[0] < 3:
+    text_type = unicode  # noqa: F821
+else:
+    text_type = None
+
+
+def open_protocol_streams():
+    """Return (commands, replies) streams and point fd 0 and 1 elsewhere.
+
+    PSSE writes straight to fd 1 and may read prompts from fd 0, so the
+    protocol uses duplicates of them instead.
+    """
+    commands_fd = os.dup(0)
+    replies_fd = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    if os.name == "nt":
+        import msvcrt
+
+        msvcrt.setmode(commands_fd, os.O_BINARY)
+        msvcrt.setmode(replies_fd, os.O_BINARY)
+    return os.fdopen(commands_fd, "rb"), os.fdopen(replies_fd, "wb")
+
+
+def send(stream, message):
+    pickle.dump(message, stream, PROTOCOL)
+    stream.flush()
+
+
+def error_info():
+    exc_type, exc_value = sys.exc_info()[:2]
+    return (exc_type.__name__, str(exc_value), traceback.format_exc())
+
+
+def import_psspy(psse_ver, psspy_dir, pssbin_dir):
+    for path in (psspy_dir, pssbin_dir):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+        os.environ["PATH"] = path + os.pathsep + os.environ.get("PATH", "")
+    # Same as pssepath.core.import_psseXX().
+    try:
+        __import__("psse%s" % (psse_ver,))
+    except ImportError:
+        pass
+    import psspy
+
+    return psspy
+
+
+def describe(psspy):
+    """Return (function names, {name: value}) of psspy's public contents."""
+    functions = []
+    values = {}
+    for name in dir(psspy):
+        if name.startswith("__"):
+            continue
+        value = getattr(psspy, name)
+        if callable(value):
+            functions.append(name)
+        elif isinstance(value, SIMPLE_TYPES):
+            values[name] = value
+    return functions, values
+
+
+def to_native(value):
+    """Python 2 only: turn unicode sent by a Python 3 client into str."""
+    if text_type is None:
+        return value
+    if isinstance(value, text_type):
+        return value.encode("latin-1")
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_native(item) for item in value)
+    if isinstance(value, dict):
+        return dict((to_native(k), to_native(v)) for k, v in value.items())
+    return value
+
+
+def array_typecode(rows):
+    for row in rows:
+        for item in row:
+            if isinstance(item, float):
+                return "d"
+            if isinstance(item, complex):
+                return "c"
+            if isinstance(item, int) and not isinstance(item, bool):
+                return "i"
+            return None
+    return None
+
+
+def to_array(rows, typecode):
+    if typecode == "c":
+        values = array.array("d")
+        for row in rows:
+            for item in row:
+                values.append(item.real)
+                values.append(item.imag)
+        return values
+    values = array.array(typecode)
+    for row in rows:
+        if typecode == "d" and not all(isinstance(item, float) for item in row):
+            raise TypeError("mixed types")
+        values.extend(row)
+    return values
+
+
+class SharedBlocks(object):
+    """Shared memory blocks holding the arrays of the last reply."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.blocks = []
+        self.count = 0
+
+    def share(self, rows, flat):
+        if sum(len(row) for row in rows) < self.threshold:
+            return None
+        typecode = array_typecode(rows)
+        if typecode is None:
+            return None
+        try:
+            values = to_array(rows, typecode)
+        except (TypeError, OverflowError):
+            return None
+        data = values.tostring() if text_type is not None else values.tobytes()
+
+        self.count += 1
+        name = "pssepath-bridge-%i-%i" % (os.getpid(), self.count)
+        if os.name == "nt":
+            import mmap
+
+            block = mmap.mmap(-1, len(data), tagname=name)
+            block.write(data)
+            self.blocks.append(block)
+        else:
+            name = os.path.join(tempfile.gettempdir(), name)
+            with open(name, "wb") as block:
+                block.write(data)
+            self.blocks.append(name)
+
+        row_lengths = None if flat else [len(row) for row in rows]
+        return (SHARED_TAG, name, typecode, len(data), row_lengths)
+
+    def pack(self, value):
+        """Return value with big numeric lists moved to shared memory."""
+        if isinstance(value, tuple):
+            return tuple(self.pack(item) for item in value)
+        if isinstance(value, list) and value:
+            if all(isinstance(row, list) for row in value):
+                shared = self.share(value, flat=False)
+            else:
+                shared = self.share([value], flat=True)
+            if shared is not None:
+                return shared
+        return value
+
+    def release(self):
+        for block in self.blocks:
+            if isinstance(block, str):
+                try:
+                    os.remove(block)
+                except OSError:
+                    # Already removed by the client.
+                    pass
+            else:
+                block.close()
+        self.blocks = []
+
+
+def run_calls(psspy, calls, blocks):
+    results = []
+    for name, args, kwargs in calls:
+        try:
+            result = getattr(psspy, name)(*to_native(args), **to_native(kwargs))
+            results.append(("ok", blocks.pack(result)))
+        except Exception:
+            results.append(("error", error_info()))
+            break
+    return results
+
+
+def main(argv):
+    psse_ver, psspy_dir, pssbin_dir, threshold = argv[1:5]
+    commands, replies = open_protocol_streams()
+    try:
+        psspy = import_psspy(psse_ver, psspy_dir, pssbin_dir)
+    except Exception:
+        send(replies, ("error", error_info()))
+        return 1
+    send(replies, ("ready", describe(psspy)))
+
+    blocks = SharedBlocks(int(threshold))
+    while True:
+        try:
+            message = pickle.load(commands)
+        except EOFError:
+            break
+        # The client has read everything from the previous reply.
+        blocks.release()
+        if message[0] == "close":
+            break
+        send(replies, ("ok", run_calls(psspy, message[1], blocks)))
+    blocks.release()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,190 @@
+"""Buffer many element changes and write them to psspy together.
+
+Changes to the same element are merged, so each element is written with a
+single psspy *_chng call however many of its fields change, and the writes
+are made one element kind at a time. Failures are collected and reported
+once per flush:
+
+    from pssepath.batch import WriteBatch
+
+    with WriteBatch() as batch:
+        batch.set("branch", (101, 102, "1"), STATUS=0)
+        batch.set_many("load", (load_buses, load_ids), PL=new_pl, QL=new_ql)
+        batch.set_many("machine", machines[["NUMBER", "ID"]], PG=dispatch)
+
+Element ids and values can be lists or NumPy arrays. See pssepath.elements
+for the element kinds, keys and fields.
+"""
+from . import network
+from .elements import get_element_kind
+
+
+# Flush order, matching the order elements appear in a case.
+KIND_ORDER = ("bus", "load", "machine", "branch")
+
+# Structured array fields (eg. from pssepath.network) holding each kind's key.
+KEY_FIELDS = {
+    "bus": ("NUMBER",),
+    "load": ("NUMBER", "ID"),
+    "machine": ("NUMBER", "ID"),
+    "branch": ("FROMNUMBER", "TONUMBER", "ID"),
+}
+
+
+class BatchWriteError(Exception):
+    """Some writes of a flush failed.
+
+    failures: [(kind, key, error)] where error is the psspy ierr or the
+        exception raised.
+    """
+
+    def __init__(self, failures, written):
+        self.failures = failures
+        self.written = written
+        shown = ", ".join("%s %s: %r" % failure for failure in failures[:5])
+        more = len(failures) - 5
+        Exception.__init__(
+            self,
+            "%i of %i element writes failed (%s%s)"
+            % (
+                len(failures),
+                len(failures) + written,
+                shown,
+                ", ... %i more" % (more,) if more > 0 else "",
+            ),
+        )
+
+
+def to_list(values):
+    """Return a list of Python values from a list, tuple or NumPy array."""
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+
+def key_columns(kind, ids):
+    """Return a list of keys from ids.
+
+    ids: a sequence of keys, a structured array with KEY_FIELDS, or a tuple
+        of id columns eg. (bus_numbers, load_ids).
+    """
+    dtype_names = getattr(getattr(ids, "dtype", None), "names", None)
+    if dtype_names:
+        columns = [to_list(ids[name]) for name in KEY_FIELDS[kind]]
+    elif isinstance(ids, tuple):
+        columns = [to_list(column) for column in ids]
+    elif len(KEY_FIELDS[kind]) == 1:
+        columns = [to_list(ids)]
+    else:
+        return [tuple(key) for key in to_list(ids)]
+
+    if len(columns) != len(KEY_FIELDS[kind]):
+        raise ValueError(
+            "%s ids need %i columns (%s)"
+            % (kind, len(KEY_FIELDS[kind]), ", ".join(KEY_FIELDS[kind]))
+        )
+    lengths = set(len(column) for column in columns)
+    if len(lengths) > 1:
+        raise ValueError("%s id columns have different lengths" % (kind,))
+    # Character ids from NumPy keep their padding, psspy doesn't need it.
+    columns = [
+        [item.strip() if isinstance(item, str) else item for item in column]
+        for column in columns
+    ]
+    return list(zip(*columns))
+
+
+class WriteBatch(object):
+    """Merges element changes until flush() writes them.
+
+    Leaving a 'with' block flushes unless an exception was raised.
+    """
+
+    def __init__(self, psspy=None):
+        if psspy is None:
+            import psspy
+        self.psspy = psspy
+        # {kind: {key: {field: value}}}
+        self._pending = {}
+
+    def __len__(self):
+        """Number of elements with pending changes."""
+        return sum(len(elements) for elements in self._pending.values())
+
+    def set(self, kind, key, **values):
+        """Change fields of one element, eg. set("load", (101, "1"), PL=10.0)."""
+        element_kind = get_element_kind(kind)
+        element_kind.check_fields(values)
+        key = element_kind.normalize_key(key)
+        self._pending.setdefault(kind, {}).setdefault(key, {}).update(values)
+
+    def set_many(self, kind, ids, **values):
+        """Change fields of many elements.
+
+        ids: see key_columns().
+        values: field=sequence with one value per id, or field=value for
+            the same value everywhere.
+        """
+        element_kind = get_element_kind(kind)
+        element_kind.check_fields(values)
+        keys = key_columns(kind, ids)
+        columns = []
+        for field, column in values.items():
+            if isinstance(column, (str, int, float)) or not hasattr(column, "__len__"):
+                column = [column] * len(keys)
+            else:
+                column = to_list(column)
+                if len(column) != len(keys):
+                    raise ValueError(
+                        "%i values for %s but %i ids" % (len(column), field, len(keys))
+                    )
+            columns.append((field, column))
+
+        pending = self._pending.setdefault(kind, {})
+        for index, key in enumerate(keys):
+            changes = pending.setdefault(key, {})
+            for field, column in columns:
+                changes[field] = column[index]
+
+    def discard(self):
+        self._pending = {}
+
+    def flush(self):
+        """Write every pending change. Returns the number of elements written.
+
+        Raises BatchWriteError listing every failed write after trying all
+        of them.
+        """
+        pending, self._pending = self._pending, {}
+        order = [kind for kind in KIND_ORDER if kind in pending]
+        order += sorted(kind for kind in pending if kind not in KIND_ORDER)
+
+        failures = []
+        written = 0
+        try:
+            for kind in order:
+                write = get_element_kind(kind).writer(self.psspy)
+                for key in sorted(pending[kind]):
+                    try:
+                        ierr = write(key, pending[kind][key])
+                    except Exception as exc:
+                        failures.append((kind, key, exc))
+                        continue
+                    if ierr:
+                        failures.append((kind, key, ierr))
+                    else:
+                        written += 1
+        finally:
+            if written or failures:
+                network.invalidate_all()
+
+        if failures:
+            raise BatchWriteError(failures, written)
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
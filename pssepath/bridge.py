@@ -0,0 +1,354 @@
+"""Use a PSSE the running Python can't load, through a helper process.
+
+PSSE 33 and 34 need 32-bit Python and every PSSE version needs particular
+Python versions. In bridge mode pssepath starts the Python that PSSE needs
+as a helper process running psspy, and installs a stand-in psspy module
+that sends each call to it:
+
+    import pssepath
+    pssepath.add_pssepath(33, bridge=True)
+
+    import psspy  # calls run in the helper process
+    psspy.psseinit(50000)
+
+Several calls can be sent in one round trip:
+
+    from pssepath.bridge import get_bridge
+
+    with get_bridge().batch() as batch:
+        futures = [batch.busdat(bus, "PU") for bus in buses]
+    voltages = [future.result()[1] for future in futures]
+
+Big numeric results, like those of psspy's array functions (abusreal,
+amachcplx, ...), come back through shared memory instead of the pipe. Pass
+arrays="numpy" to get them as NumPy arrays instead of lists.
+
+The helper runs pssepath/_bridge_server.py, see there for the protocol.
+"""
+import array
+import logging
+import mmap
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import types
+
+try:
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+from . import core
+from ._bridge_server import PROTOCOL, SHARED_TAG
+from .executor import normalize_call
+
+
+logger = logging.getLogger(__name__)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_bridge_server.py")
+
+# Numeric lists at least this long are passed through shared memory.
+SHARED_THRESHOLD = 1024
+
+if sys.version_info[0] >= 3:
+    # Python 2 str pickles are decoded as latin-1 text.
+    LOAD_KWARGS = {"encoding": "latin1"}
+else:
+    LOAD_KWARGS = {}
+
+
+class BridgeError(Exception):
+    pass
+
+
+class BridgeCallError(BridgeError):
+    """A psspy call raised an exception in the helper process.
+
+    exc_type is the name of the exception raised there.
+    """
+
+    def __init__(self, exc_type, message, remote_traceback):
+        BridgeError.__init__(self, "%s: %s" % (exc_type, message))
+        self.exc_type = exc_type
+        self.remote_traceback = remote_traceback
+
+
+def read_shared(name, size):
+    if os.name == "nt":
+        block = mmap.mmap(-1, size, tagname=name, access=mmap.ACCESS_READ)
+        try:
+            return block[:size]
+        finally:
+            block.close()
+    with open(name, "rb") as block:
+        data = block.read(size)
+    os.remove(name)
+    return data
+
+
+def unpack_lists(data, typecode, row_lengths):
+    values = array.array("d" if typecode == "c" else typecode)
+    if hasattr(values, "frombytes"):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if typecode == "c":
+        values = [complex(*pair) for pair in zip(values[::2], values[1::2])]
+    else:
+        values = values.tolist()
+    if row_lengths is None:
+        return values
+    rows = []
+    start = 0
+    for length in row_lengths:
+        rows.append(values[start : start + length])
+        start += length
+    return rows
+
+
+def unpack_numpy(data, typecode, row_lengths):
+    import numpy as np
+
+    dtype = {"d": np.float64, "c": np.complex128, "i": np.intc}[typecode]
+    values = np.frombuffer(data, dtype=dtype).copy()
+    if row_lengths is None:
+        return values
+    if len(set(row_lengths)) == 1:
+        return values.reshape(len(row_lengths), row_lengths[0])
+    return np.split(values, np.cumsum(row_lengths)[:-1])
+
+
+class BridgePsspy(types.ModuleType):
+    """psspy stand-in that runs each function call in the helper process."""
+
+    def __init__(self, client, functions, values):
+        types.ModuleType.__init__(self, "psspy")
+        self.__dict__.update(values)
+        self._bridge_client = client
+        self._bridge_functions = frozenset(functions)
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name not in self._bridge_functions:
+            raise AttributeError("psspy has no attribute %r" % (name,))
+        client = self._bridge_client
+
+        def remote_call(*args, **kwargs):
+            return client.call(name, *args, **kwargs)
+
+        remote_call.__name__ = name
+        self.__dict__[name] = remote_call
+        return remote_call
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | self._bridge_functions)
+
+
+class BridgeBatch(object):
+    """Collects calls to send to the helper process in one round trip.
+
+    Attribute access returns a function that queues the psspy call of that
+    name and returns its future. The calls are sent when leaving the 'with'
+    block. Calls after one that fails are not run.
+    """
+
+    def __init__(self, client):
+        if Future is None:
+            raise ImportError("Batches require concurrent.futures (Python 3.2+).")
+        self._client = client
+        self._calls = []
+        self._futures = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def queue_call(*args, **kwargs):
+            future = Future()
+            self._calls.append((name, args, kwargs))
+            self._futures.append(future)
+            return future
+
+        return queue_call
+
+    def flush(self):
+        calls, futures = self._calls, self._futures
+        self._calls, self._futures = [], []
+        if not calls:
+            return
+        try:
+            results = self._client.send_calls(calls)
+        except Exception as exc:
+            for future in futures:
+                future.set_exception(exc)
+            raise
+        for future, result in zip(futures, results):
+            status, value = result
+            if status == "ok":
+                future.set_result(value)
+            else:
+                future.set_exception(BridgeCallError(*value))
+        for future in futures[len(results) :]:
+            future.set_exception(BridgeError("Not run, an earlier call in the batch failed."))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+
+class BridgeClient(object):
+    """Runs psspy in python_exe and forwards calls to it.
+
+    arrays: "list" to return shared numeric results as lists like psspy
+        does, or "numpy" for NumPy arrays.
+    """
+
+    def __init__(
+        self,
+        python_exe,
+        psse_ver,
+        psspy_dir,
+        arrays="list",
+        shared_threshold=SHARED_THRESHOLD,
+    ):
+        if arrays not in ("list", "numpy"):
+            raise ValueError('arrays must be "list" or "numpy", not %r' % (arrays,))
+        self._unpack = unpack_numpy if arrays == "numpy" else unpack_lists
+        self._lock = threading.Lock()
+        self.psse_ver = psse_ver
+        self.python_exe = python_exe
+        self._process = subprocess.Popen(
+            [
+                python_exe,
+                SERVER_SCRIPT,
+                str(psse_ver),
+                psspy_dir,
+                core.get_pssbin_dir(psse_ver, psspy_dir),
+                str(shared_threshold),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            status, value = self._recv()
+        except BridgeError:
+            self._process.kill()
+            raise
+        if status != "ready":
+            self.close()
+            raise core.PsseImportError(
+                "Could not import psspy with %s:\n%s" % (python_exe, value[2])
+            )
+        functions, values = value
+        self.psspy = BridgePsspy(self, functions, values)
+
+    def _send(self, message):
+        try:
+            pickle.dump(message, self._process.stdin, PROTOCOL)
+            self._process.stdin.flush()
+        except (IOError, OSError):
+            raise BridgeError("The psspy helper process has stopped.")
+
+    def _recv(self):
+        try:
+            return pickle.load(self._process.stdout, **LOAD_KWARGS)
+        except EOFError:
+            raise BridgeError(
+                "The psspy helper process exited (code %s)." % (self._process.poll(),)
+            )
+
+    def unpack(self, value):
+        if isinstance(value, tuple):
+            if len(value) == 5 and value[0] == SHARED_TAG:
+                name, typecode, size, row_lengths = value[1:]
+                return self._unpack(read_shared(name, size), typecode, row_lengths)
+            return tuple(self.unpack(item) for item in value)
+        return value
+
+    def send_calls(self, calls):
+        """Run [(name, args, kwargs), ...] in one round trip.
+
+        Returns [(status, value)] where status is "ok" or "error", stopping
+        after the first error.
+        """
+        calls = [normalize_call(call) for call in calls]
+        with self._lock:
+            self._send(("call", [(name, tuple(args), dict(kwargs)) for name, args, kwargs in calls]))
+            _, results = self._recv()
+            # Shared memory must be read before the next message is sent.
+            return [
+                (status, self.unpack(value) if status == "ok" else value)
+                for status, value in results
+            ]
+
+    def call_batch(self, calls):
+        """Run [(name, args, kwargs), ...] in one round trip and return the results.
+
+        args and kwargs may be left off each call. Raises BridgeCallError if
+        a call fails.
+        """
+        results = []
+        for status, value in self.send_calls(calls):
+            if status != "ok":
+                exc_type, message, remote_traceback = value
+                logger.debug("psspy call failed in the helper:\n%s", remote_traceback)
+                raise BridgeCallError(exc_type, message, remote_traceback)
+            results.append(value)
+        return results
+
+    def call(self, name, *args, **kwargs):
+        return self.call_batch([(name, args, kwargs)])[0]
+
+    def batch(self):
+        return BridgeBatch(self)
+
+    def close(self, timeout=10):
+        if self._process.poll() is None:
+            try:
+                self._send(("close",))
+                self._process.stdin.close()
+            except (BridgeError, IOError, OSError):
+                pass
+            try:
+                self._process.wait(timeout)
+            except Exception:
+                self._process.kill()
+        self._process.stdout.close()
+
+
+_bridge = None
+
+
+def start_bridge(psse_ver, psspy_dir, python_exe, **kwargs):
+    """Start a BridgeClient and install its psspy as the psspy module."""
+    global _bridge
+
+    import atexit
+
+    client = BridgeClient(python_exe, psse_ver, psspy_dir, **kwargs)
+    if _bridge is None:
+        atexit.register(stop_bridge)
+    else:
+        _bridge.close()
+    _bridge = client
+    sys.modules["psspy"] = client.psspy
+    return client
+
+
+def get_bridge():
+    """Return the BridgeClient started by add_pssepath(bridge=True) or None."""
+    return _bridge
+
+
+def stop_bridge():
+    global _bridge
+
+    if _bridge is not None:
+        if sys.modules.get("psspy") is _bridge.psspy:
+            del sys.modules["psspy"]
+        _bridge.close()
+        _bridge = None
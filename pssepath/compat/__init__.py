@@ -5,8 +5,13 @@ try:
     # Py2
     import _winreg as winreg
 except ImportError:
-    # Py3
-    import winreg
+    try:
+        # Py3
+        import winreg
+    except ImportError:
+        # Not Windows: only the parts of pssepath that don't search the
+        # registry for installs work, eg. reading PSSE output files.
+        winreg = None
 
 py_major_version = sys.version_info[0]
 
@@ -17,7 +22,9 @@ else:
     from ._compat2 import compat_input, simple_print  # noqa: F401
 
 
-if py_major_version == 3:
+if winreg is None:
+    open_hkey_ctxmg = None
+elif py_major_version == 3:
     open_hkey_ctxmg = winreg.OpenKey
 else:
     @contextmanager
@@ -1,7 +1,9 @@
 from __future__ import with_statement
 
+import json
 import logging
 import os
+import re
 import sys
 from functools import wraps
 from textwrap import dedent
@@ -10,8 +12,13 @@ try:
     # Py2
     import _winreg as winreg
 except ImportError:
-    # Py3
-    import winreg
+    try:
+        # Py3
+        import winreg
+    except ImportError:
+        # Not Windows: only the parts of pssepath that don't search the
+        # registry for installs work, eg. reading PSSE output files.
+        winreg = None
 
 try:
     import importlib
@@ -29,11 +36,31 @@ logger = logging.getLogger(__name__)
 PSSE_VERSION = None
 INITIALIZED = False
 
+# Environment variable used to hand the resolved PSSE selection down to child
+# processes so they can skip the registry and filesystem discovery.
+SELECTION_ENV_VAR = "PSSEPATH_SELECTION"
+
+# Extra directories (os.pathsep separated) searched for PSSE installs, eg.
+# network shares or xcopy deployed installs that aren't in the registry.
+SEARCH_ROOTS_ENV_VAR = "PSSEPATH_SEARCH_ROOTS"
+# How far below a search root a PSSE dir (eg. PTI\PSSE35) can be.
+SEARCH_DEPTH = 2
+# Search results kept between runs, in get_user_data_dir().
+SEARCH_CACHE_FILE = "search_cache.json"
+
 
 class PsseImportError(Exception):
     pass
 
 
+class PsspyError(Exception):
+    """A psspy call returned a non-zero ierr."""
+
+    def __init__(self, msg, ierr=None):
+        Exception.__init__(self, msg)
+        self.ierr = ierr
+
+
 def check_psspy_already_in_path():
     """Return True if psspy.pyc in the sys.path and os.environ['PATH'] dirs.
 
@@ -59,21 +86,47 @@ def check_psspy_already_in_path():
     return False
 
 
+def psse_already_set_up():
+    """Return True if PSSE was set up before, by pssepath or the environment."""
+    if INITIALIZED:
+        logger.info("psspath has already added PSSBIN to the system, continuing.")
+        return True
+    if check_psspy_already_in_path():
+        check_already_present_psse()
+        logger.info("PSSBIN already in path, adding PSSBIN from pssepath skipped.")
+        if PSSE_VERSION is None:
+            set_status(psse_version=get_present_psse_version())
+        set_status(initialized=True)
+        return True
+    return False
+
+
 def check_initialized(fn):
     @wraps(fn)
     def wrapped(*args, **kwargs):
-        if INITIALIZED:
-            logger.info("psspath has already added PSSBIN to the system, continuing.")
-        elif check_psspy_already_in_path():
-            check_already_present_psse()
-            logger.info("PSSBIN already in path, adding PSSBIN from pssepath skipped.")
-            set_status(initialized=True)
-        else:
-            fn(*args, **kwargs)
+        if not psse_already_set_up():
+            return fn(*args, **kwargs)
 
     return wrapped
 
 
+def get_present_psse_version():
+    """Return the version of the PSSE already on sys.path, None if unknown.
+
+    Read from the install dirs, eg. PSSE35\\35.4\\PSSPY37 is 35.4.
+    """
+    psspy_file = find_file_on_path("psspy.pyc", sys.path)
+    if not psspy_file:
+        return None
+    for name in reversed(os.path.normpath(os.path.dirname(psspy_file)).split(os.sep)):
+        if POINT_VERSION_RE.match(name):
+            return float(name)
+        match = PSSE_DIR_RE.match(name)
+        if match:
+            return int(match.group(1))
+    return None
+
+
 @helpers.run_once
 def log_path_noenviron_warning():
     logger.warning(
@@ -121,6 +174,20 @@ def log_pathmismatch_warning(syspath, envpath):
     )
 
 
+def get_pssbin_dir(psse_ver, psspy_path):
+    """Return the PSSBIN dir that goes with the psspy dir of psse_ver."""
+    if psse_ver >= 34:
+        return os.path.join(os.path.dirname(psspy_path), "PSSBIN")
+    return psspy_path
+
+
+def prepend_env_path(path):
+    """Put path at the start of os.environ['PATH'] unless it is already there."""
+    env_path = os.environ["PATH"]
+    if env_path.split(";")[0] != path:
+        os.environ["PATH"] = path + ";" + env_path
+
+
 def add_dir_to_path(psse_ver, psse_path):
     """Add psse_path to 'sys.path' and 'os.environ['PATH'].
 
@@ -131,13 +198,13 @@ def add_dir_to_path(psse_ver, psse_path):
     This is all side-effects which is not the prettiest.
     """
     sys.path.insert(0, psse_path)
-    os.environ["PATH"] = psse_path + ";" + os.environ["PATH"]
+    prepend_env_path(psse_path)
 
     if psse_ver >= 34:
         # Also add the PSSBIN dir
-        pssebin_dir = os.path.join(os.path.dirname(psse_path), "PSSBIN")
+        pssebin_dir = get_pssbin_dir(psse_ver, psse_path)
         sys.path.insert(0, pssebin_dir)
-        os.environ["PATH"] = pssebin_dir + ";" + os.environ["PATH"]
+        prepend_env_path(pssebin_dir)
 
 
 def import_psseXX(psse_ver):
@@ -155,6 +222,13 @@ def import_psseXX(psse_ver):
             pass
 
 
+def check_registry_available():
+    if winreg is None:
+        raise PsseImportError(
+            "PSSE and Python installs can only be found on Windows."
+        )
+
+
 def search_pssbin_reg_key(pti_key):
     pssbin_paths = {}
     for sub_key in helpers.enum_reg_keys(pti_key):
@@ -187,8 +261,13 @@ def search_pssbin_reg_key(pti_key):
 
 @helpers.memoize
 def get_pssbin_paths_dict():
+    """Return {psse_ver: pssbin_dir} from the registry and a filesystem scan.
+
+    Registry entries win where both find a version, and installs the
+    registry lists aren't added again under another version number.
+    """
     pssbin_paths = {}
-    if helpers.is_win64():
+    if winreg is not None and helpers.is_win64():
         # Check 32bit install registry
         try:
             with open_hkey_ctxmg(
@@ -203,7 +282,7 @@ def get_pssbin_paths_dict():
                 pssbin_paths.update(search_pssbin_reg_key(pti_key))
         except WindowsError:
             pass
-    else:
+    elif winreg is not None:
         # Only 32bit install registry
         try:
             with open_hkey_ctxmg(winreg.HKEY_LOCAL_MACHINE, "SOFTWARE\\PTI") as pti_key:
@@ -211,22 +290,260 @@ def get_pssbin_paths_dict():
         except WindowsError:
             pass
 
+    registered = set(normalize_dir(pssbin) for pssbin in pssbin_paths.values())
+    for psse_ver, pssbin in scan_for_psse(get_search_roots()).items():
+        if normalize_dir(pssbin) not in registered:
+            pssbin_paths.setdefault(psse_ver, pssbin)
+
     if not len(pssbin_paths):
-        raise PsseImportError("No installs of PSSE found.")
+        raise PsseImportError(
+            "No installs of PSSE found. Set %s to search other directories."
+            % (SEARCH_ROOTS_ENV_VAR,)
+        )
 
     return pssbin_paths
 
 
+# ============== Filesystem search for PSSE installs
+PSSE_DIR_RE = re.compile(r"^PSSE ?(\d\d)(?!\d)", re.IGNORECASE)
+POINT_VERSION_RE = re.compile(r"^(\d\d)\.(\d+)$")
+
+
+def get_user_data_dir():
+    """Return the dir for pssepath's per user files, %LOCALAPPDATA%\\pssepath."""
+    base_dir = os.environ.get("LOCALAPPDATA")
+    if base_dir:
+        return os.path.join(base_dir, "pssepath")
+    return os.path.join(os.path.expanduser("~"), ".pssepath")
+
+
+def get_search_roots():
+    """Return the Program Files dirs PSSE installs to and SEARCH_ROOTS_ENV_VAR's."""
+    roots = []
+    for psse_version in (33, 35):
+        try:
+            roots.append(get_psse_programfiles(psse_version))
+        except Exception:
+            # Not Windows, or 32bit Windows for PSSE 35.
+            pass
+    extra_roots = os.environ.get(SEARCH_ROOTS_ENV_VAR, "")
+    roots.extend(root for root in extra_roots.split(os.pathsep) if root)
+
+    unique_roots = []
+    for root in roots:
+        if root and root not in unique_roots:
+            unique_roots.append(root)
+    return unique_roots
+
+
+def normalize_dir(path):
+    """Return path in a form that compares equal for the same dir."""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def list_subdirs(path):
+    """Return [(name, path)] of the dirs in path, [] if it can't be read."""
+    try:
+        if hasattr(os, "scandir"):
+            return [
+                (entry.name, entry.path)
+                for entry in os.scandir(path)
+                if entry.is_dir()
+            ]
+        return [
+            (name, os.path.join(path, name))
+            for name in os.listdir(path)
+            if os.path.isdir(os.path.join(path, name))
+        ]
+    except OSError:
+        return []
+
+
+def map_concurrently(fn, items):
+    """Return [fn(item)] run on threads, as dirs on network shares are slow to list."""
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        return [fn(item) for item in items]
+    if len(items) < 2:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(16, len(items))) as executor:
+        return list(executor.map(fn, items))
+
+
+def read_psse_dir(psse_dir, major_version, subdirs, visited):
+    """Return {psse_ver: pssbin_dir} of a PSSE dir, eg. PTI\\PSSE35.
+
+    PSSE 35 installs each point version in its own dir, eg. PSSE35\\35.5\\PSSBIN.
+    visited: {path: mtime} the point version dirs are added to.
+    """
+    found = {}
+    for name, path in subdirs:
+        if name.upper() == "PSSBIN":
+            found[major_version] = path
+            continue
+        match = POINT_VERSION_RE.match(name)
+        if match and int(match.group(1)) == major_version:
+            visited[path] = dir_mtime(path)
+            pssbin = os.path.join(path, "PSSBIN")
+            if os.path.isdir(pssbin):
+                # Same version numbers as search_pssbin_reg_key().
+                found[float(name)] = pssbin
+    return found
+
+
+def list_subdirs_with_mtime(path):
+    # The mtime is read first so a change while listing triggers a rescan.
+    return dir_mtime(path), list_subdirs(path)
+
+
+def scan_root(root, max_depth=SEARCH_DEPTH):
+    """Return ({psse_ver: pssbin_dir}, {path: mtime}) of the PSSE dirs up to
+    max_depth below root and of every dir read to find them.
+
+    Each level of dirs is listed concurrently.
+    """
+    visited = {}
+    psse_dirs = []
+    level = [root]
+    for depth in range(max_depth + 1):
+        if not level:
+            break
+        next_level = []
+        listings = map_concurrently(list_subdirs_with_mtime, level)
+        for path, (mtime, subdirs) in zip(level, listings):
+            visited[path] = mtime
+            for name, subdir in subdirs:
+                match = PSSE_DIR_RE.match(name)
+                if match:
+                    psse_dirs.append((subdir, int(match.group(1))))
+                elif depth + 1 < max_depth:
+                    next_level.append(subdir)
+        level = next_level
+
+    root_match = PSSE_DIR_RE.match(os.path.basename(os.path.normpath(root)))
+    if root_match:
+        psse_dirs.append((root, int(root_match.group(1))))
+
+    found = {}
+    listings = map_concurrently(list_subdirs_with_mtime, [path for path, _ in psse_dirs])
+    for (psse_dir, major_version), (mtime, subdirs) in zip(psse_dirs, listings):
+        visited[psse_dir] = mtime
+        for psse_ver, pssbin in read_psse_dir(
+            psse_dir, major_version, subdirs, visited
+        ).items():
+            found.setdefault(psse_ver, pssbin)
+    return found, visited
+
+
+def get_search_cache_path():
+    return os.path.join(get_user_data_dir(), SEARCH_CACHE_FILE)
+
+
+def load_search_cache(path):
+    """Return {"root|max_depth": {"visited": {path: mtime}, "found": [[psse_ver, pssbin]]}}."""
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return dict(
+        (key, entry)
+        for key, entry in cache.items()
+        if isinstance(entry, dict)
+        and isinstance(entry.get("visited"), dict)
+        and isinstance(entry.get("found"), list)
+    )
+
+
+def save_search_cache(path, cache):
+    import tempfile
+
+    try:
+        cache_dir = os.path.dirname(path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temp_path, path)
+    except (IOError, OSError):
+        logger.debug("Could not save the PSSE search cache to %s", path, exc_info=True)
+
+
+def scan_for_psse(roots, max_depth=SEARCH_DEPTH, cache_path=None):
+    """Return {psse_ver: pssbin_dir} found below roots, earlier roots first.
+
+    Each root's result is kept in cache_path (get_search_cache_path() by
+    default) and reused until a dir read to find it changes.
+    """
+    if cache_path is None:
+        cache_path = get_search_cache_path()
+    cache = load_search_cache(cache_path)
+    roots = [root for root in roots if dir_mtime(root) is not None]
+    keys = dict((root, "%s|%i" % (root, max_depth)) for root in roots)
+
+    cached_roots = [root for root in roots if keys[root] in cache]
+    visited = {}
+    for root in cached_roots:
+        visited.update(cache[keys[root]]["visited"])
+    paths = sorted(visited)
+    changed = set(
+        path
+        for path, mtime in zip(paths, map_concurrently(dir_mtime, paths))
+        if mtime != visited[path]
+    )
+    stale_roots = [
+        root
+        for root in roots
+        if root not in cached_roots
+        or changed.intersection(cache[keys[root]]["visited"])
+    ]
+
+    scans = map_concurrently(lambda root: scan_root(root, max_depth), stale_roots)
+    for root, (found, root_visited) in zip(stale_roots, scans):
+        cache[keys[root]] = {
+            "visited": root_visited,
+            "found": sorted(found.items()),
+        }
+    if stale_roots:
+        save_search_cache(cache_path, cache)
+
+    pssbin_paths = {}
+    for root in roots:
+        for psse_ver, pssbin in cache[keys[root]]["found"]:
+            pssbin_paths.setdefault(psse_ver, pssbin)
+    return pssbin_paths
+
+
+def iter_psse_locations():
+    """Yield ((psse_ver, pyver), psspy_path), newest PSSE version first.
+
+    Only the registry is read up front. Each PSSE install's psspy dirs are
+    read when the generator reaches it, so stopping early skips the rest.
+    """
+    pssbin_paths = get_pssbin_paths_dict()
+    for psse_ver in sorted(pssbin_paths, reverse=True):
+        pyvers_and_psspy_paths = get_required_python_ver_and_paths(
+            psse_ver, pssbin_paths[psse_ver]
+        )
+        for pyver, psspy_path in sorted(pyvers_and_psspy_paths, reverse=True):
+            yield (psse_ver, pyver), psspy_path
+
+
 @helpers.memoize
 def get_psse_locations_dict():
     """Return a dict of {(psse_ver, pyver): psspy_path}"""
-    psspy_dirs = {}
-    pssbin_paths = get_pssbin_paths_dict()
-    for psse_ver, pssbin in pssbin_paths.items():
-        pyvers_and_psspy_paths = get_required_python_ver_and_paths(psse_ver, pssbin)
-        for pyver, psspy_path in pyvers_and_psspy_paths:
-            psspy_dirs[(psse_ver, pyver)] = psspy_path
-    return psspy_dirs
+    return dict(iter_psse_locations())
 
 
 def get_psse_arch(psse_version):
@@ -258,15 +575,193 @@ def check_to_raise_compat_python_error(psse_and_py_versions):
         )
 
 
-@check_initialized
-def add_pssepath(pref_psse_ver=None):
+def publish_selection(psse_ver, psspy_path, pyver):
+    """Record the selected PSSE in os.environ so child processes inherit it.
+
+    Children started with 'spawn' semantics (multiprocessing on Windows or a
+    plain subprocess) re-import pssepath and call add_pssepath() again. They
+    can use this to skip discovery entirely.
+    """
+    os.environ[SELECTION_ENV_VAR] = json.dumps(
+        {
+            "psse_version": psse_ver,
+            "psspy_dir": psspy_path,
+            "pssbin_dir": get_pssbin_dir(psse_ver, psspy_path),
+            "python": list(pyver),
+        }
+    )
+
+
+def get_inherited_selection(pref_psse_ver=None):
+    """Return (psse_ver, psspy_path) published by a parent process.
+
+    Returns None if there is no published selection, or if it is not usable
+    by the running interpreter or doesn't match pref_psse_ver.
+    """
+    published = os.environ.get(SELECTION_ENV_VAR)
+    if not published:
+        return None
+
+    try:
+        selection = json.loads(published)
+        psse_ver = selection["psse_version"]
+        psspy_path = selection["psspy_dir"]
+        pssbin_dir = selection["pssbin_dir"]
+        pyver = tuple(selection["python"])
+    except (ValueError, KeyError, TypeError):
+        logger.debug("Ignoring malformed %s: %r", SELECTION_ENV_VAR, published)
+        return None
+
+    if pyver != helpers.get_python_ver():
+        return None
+    if pref_psse_ver and pref_psse_ver != psse_ver:
+        return None
+    if not (
+        os.path.isfile(os.path.join(psspy_path, "psspy.pyc"))
+        and os.path.isdir(pssbin_dir)
+    ):
+        return None
+
+    return psse_ver, psspy_path
+
+
+def activate_psse(psse_ver, psspy_path, pyver):
+    """Make the selected PSSE importable and record the selection."""
+    add_dir_to_path(psse_ver, psspy_path)
+    import_psseXX(psse_ver)
+    publish_selection(psse_ver, psspy_path, pyver)
+    set_status(psse_version=psse_ver, initialized=True)
+
+
+def add_pssepath(
+    pref_psse_ver=None,
+    licence_seats=None,
+    seats_dir=None,
+    seat_timeout=None,
+    capture_output=None,
+    watchdog=None,
+    bridge=False,
+    bridge_options=None,
+):
     """Add the PSSBIN path to the required locations.
 
     Try to import the requested version of PSSE. If the requested version
     doesn't work, raise an exception. By default, import the latest version.
+
+    If a parent process has already resolved a compatible selection (see
+    SELECTION_ENV_VAR), it is reused without searching for PSSE installs.
+
+    licence_seats limits how many processes on this host (or sharing
+    seats_dir) initialise PSSE at once; an int for every version or a dict of
+    {psse_ver: seats}. The seat is taken before PSSE is initialised and held
+    until the process exits or pssepath.release_licence_seat() is called. See
+    pssepath.seats.
+
+    capture_output (True or a pssepath.output.OutputCapture) routes psspy's
+    progress, report, alert and prompt output away from the terminal once
+    psspy.psseinit() has run. The OutputCapture is returned and is also
+    available from pssepath.get_output_capture().
+
+    watchdog (True or a pssepath.watchdog.Watchdog) starts sampling the
+    process's memory and handle use once PSSE is set up. It is available
+    from pssepath.get_watchdog().
+
+    bridge allows selecting a PSSE that needs a different Python version or
+    bitness than the one running. psspy then runs in that Python as a helper
+    process and 'import psspy' returns a stand-in forwarding calls to it.
+    bridge_options is a dict of extra pssepath.bridge.BridgeClient
+    arguments, eg. {"arrays": "numpy", "shared_threshold": 4096}. See
+    pssepath.bridge.
+
+    If PSSE is already set up, by an earlier call or because psspy is on the
+    path, the search is skipped but licence_seats, watchdog and
+    capture_output still apply.
     """
-    psspy_paths = get_psse_locations_dict()
+    if psse_already_set_up():
+        if licence_seats:
+            acquire_seat(PSSE_VERSION, licence_seats, seats_dir, seat_timeout)
+    else:
+        set_up_psse(
+            pref_psse_ver,
+            licence_seats,
+            seats_dir,
+            seat_timeout,
+            bridge,
+            bridge_options,
+        )
+
+    if watchdog:
+        from .watchdog import get_watchdog, install_watchdog
+
+        if watchdog is not True or get_watchdog() is None:
+            install_watchdog(watchdog)
+
+    if capture_output:
+        from .output import get_output_capture, install_output_capture
+
+        if capture_output is True and get_output_capture() is not None:
+            return get_output_capture()
+        return install_output_capture(capture_output)
+
+
+def acquire_seat(psse_ver, licence_seats, seats_dir, seat_timeout):
+    from . import seats
+
+    if psse_ver is None and isinstance(licence_seats, dict):
+        raise PsseImportError(
+            "Can't tell the version of the PSSE already on the path to pick its "
+            "licence_seats, pass licence_seats as an int instead."
+        )
+    seats.acquire_psse_seat(psse_ver, licence_seats, seats_dir, seat_timeout)
+
+
+def set_up_psse(
+    pref_psse_ver, licence_seats, seats_dir, seat_timeout, bridge, bridge_options=None
+):
+    """Find and activate PSSE for add_pssepath()."""
     current_pyver = helpers.get_python_ver()
+    bridge_pyver = None
+    selection = get_inherited_selection(pref_psse_ver)
+    if selection is None and bridge:
+        selection, bridge_pyver = find_bridge_selection(pref_psse_ver, current_pyver)
+    elif selection is None:
+        selection = find_psse_selection(pref_psse_ver, current_pyver)
+    selected_psse_ver, selected_path = selection
+
+    if licence_seats:
+        acquire_seat(selected_psse_ver, licence_seats, seats_dir, seat_timeout)
+    if bridge_pyver is None:
+        activate_psse(selected_psse_ver, selected_path, current_pyver)
+    else:
+        from .bridge import start_bridge
+
+        start_bridge(
+            selected_psse_ver,
+            selected_path,
+            find_python_executable(bridge_pyver),
+            **(bridge_options or {})
+        )
+        set_status(psse_version=selected_psse_ver, initialized=True)
+
+
+def find_psse_selection(pref_psse_ver, current_pyver):
+    """Return (psse_ver, psspy_path) of the PSSE add_pssepath() should use."""
+    # Only read the installs needed to find a compatible one. The full dict
+    # below is only built to explain why nothing was compatible.
+    if pref_psse_ver:
+        pssbin = get_pssbin_paths_dict().get(pref_psse_ver)
+        if pssbin is not None:
+            for pyver, psspy_path in get_required_python_ver_and_paths(
+                pref_psse_ver, pssbin
+            ):
+                if pyver == current_pyver:
+                    return pref_psse_ver, psspy_path
+    else:
+        for (psse_ver, pyver), psspy_path in iter_psse_locations():
+            if pyver == current_pyver:
+                return psse_ver, psspy_path
+
+    psspy_paths = get_psse_locations_dict()
 
     if pref_psse_ver:
         available_psse_versions_set = set()
@@ -321,10 +816,47 @@ def add_pssepath(pref_psse_ver=None):
                 )
             )
 
-    selected_path = psspy_paths[(selected_psse_ver, current_pyver)]
-    add_dir_to_path(selected_psse_ver, selected_path)
-    import_psseXX(selected_psse_ver)
-    set_status(psse_version=selected_psse_ver, initialized=True)
+    return selected_psse_ver, psspy_paths[(selected_psse_ver, current_pyver)]
+
+
+def find_bridge_selection(pref_psse_ver, current_pyver):
+    """Return ((psse_ver, psspy_path), bridge_pyver) for add_pssepath(bridge=True).
+
+    Selects pref_psse_ver or the latest PSSE regardless of the Python it
+    needs. bridge_pyver is None if the running Python can load it, otherwise
+    the (version, nbits) of an installed Python that can.
+    """
+    psspy_paths = get_psse_locations_dict()
+    available_psse_versions = sorted(set(psse_ver for psse_ver, _ in psspy_paths))
+    if pref_psse_ver:
+        if pref_psse_ver not in available_psse_versions:
+            # Raises the usual error about the version not being installed.
+            find_psse_selection(pref_psse_ver, current_pyver)
+        selected_psse_ver = pref_psse_ver
+    elif available_psse_versions:
+        selected_psse_ver = available_psse_versions[-1]
+    else:
+        raise PsseImportError("No installed PSSE versions found.")
+
+    pyvers = sorted(
+        [pyver for psse_ver, pyver in psspy_paths if psse_ver == selected_psse_ver],
+        reverse=True,
+    )
+    if current_pyver in pyvers:
+        return (selected_psse_ver, psspy_paths[(selected_psse_ver, current_pyver)]), None
+
+    for pyver in pyvers:
+        if find_python_executable(pyver, required=False):
+            return (selected_psse_ver, psspy_paths[(selected_psse_ver, pyver)]), pyver
+
+    raise PsseImportError(
+        "PSSE %s (%s) requires Python %s, which is not installed."
+        % (
+            selected_psse_ver,
+            get_psse_arch(selected_psse_ver),
+            " or ".join(["-".join(pyver) for pyver in pyvers]),
+        )
+    )
 
 
 @check_initialized
@@ -350,9 +882,7 @@ def select_pssepath():
     psse_ver, pyver = selected_key
     selected_path = psspy_paths[selected_key]
     check_to_raise_compat_python_error(selected_key)
-    add_dir_to_path(psse_ver, selected_path)
-    import_psseXX(psse_ver)
-    set_status(psse_version=selected_key, initialized=True)
+    activate_psse(psse_ver, selected_path, pyver)
 
 
 def print_psse_selection():
@@ -453,6 +983,7 @@ def get_pythons_by_location():
             python_dict[path] = (version, company, arch)
         return python_dict
 
+    check_registry_available()
     pythons_by_location = {}
     unknown_bits = "?bits"
     try:
@@ -562,6 +1093,7 @@ def get_required_python_ver_psse_34_and_newer(pssbin, psse_ver):
     return pyvers_and_paths
 
 
+@helpers.memoize
 def get_required_python_ver_and_paths(psse_ver, pssbin):
     """
     Return a list of [(pyver, psspy_dir), ...] or [] if no path.
@@ -597,6 +1129,22 @@ def get_installed_py_vers():
     return python_vers
 
 
+def find_python_executable(pyver, required=True):
+    """Return the python.exe of an installed Python matching (version, nbits).
+
+    Returns None, or raises PsseImportError if required, when there is none.
+    """
+    for path, (version, company, arch) in sorted(get_pythons_by_location().items()):
+        if (version, arch) != tuple(pyver):
+            continue
+        python_exe = os.path.join(path, "python.exe")
+        if os.path.isfile(python_exe):
+            return python_exe
+    if required:
+        raise PsseImportError("No install of Python %s found." % ("-".join(pyver),))
+    return None
+
+
 def get_psse_programfiles(psse_version):
     if psse_version < 35:
         return helpers.get_programfiles_32()
@@ -0,0 +1,447 @@
+"""Keep initialised psspy sessions warm in a local daemon.
+
+Start the daemon once (it runs until interrupted):
+
+    python -m pssepath.daemon --sessions 2 --psse-version 35 --buses 50000
+
+and submit work from short lived scripts:
+
+    from pssepath.daemon import DaemonClient
+
+    with DaemonClient() as client:
+        client.psspy.case(r"c:\\cases\\base.sav")
+        client.psspy.fnsl()
+        ierr, pu = client.psspy.busdat(101, "PU")
+        results = client.call_batch([("fnsl",), (my_module.study, (101,))])
+
+Each session is a separate process that has run add_pssepath(), imported
+psspy and, optionally, psspy.psseinit(). A job is a list of calls, each a
+psspy function name or a picklable callable, and runs on one session from
+start to finish. Jobs are queued first in, first out for each client and
+handed out round-robin across clients, so one client can't starve another.
+
+The daemon listens on a named pipe by default. Anything that can connect to
+it can run code in the sessions, so connections must know the authkey. It
+is taken from the authkey argument, then PSSEPATH_DAEMON_AUTHKEY, then a
+random key created on first use in a file only the current user can read
+(PSSEPATH_DAEMON_AUTHKEY_FILE, or %LOCALAPPDATA%\\pssepath\\daemon_authkey).
+Use a different authkey and address only if you know who else can reach
+them.
+"""
+import argparse
+import binascii
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import traceback
+from collections import deque
+from multiprocessing.connection import Client, Listener
+
+from . import core
+from .executor import normalize_call, resolve_call
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_ADDRESS = r"\\.\pipe\pssepath"
+AUTHKEY_ENV_VAR = "PSSEPATH_DAEMON_AUTHKEY"
+AUTHKEY_FILE_ENV_VAR = "PSSEPATH_DAEMON_AUTHKEY_FILE"
+AUTHKEY_BYTES = 32
+
+
+class PsseDaemonError(Exception):
+    pass
+
+
+def get_authkey_path():
+    """Return PSSEPATH_DAEMON_AUTHKEY_FILE or the per user key file."""
+    path = os.environ.get(AUTHKEY_FILE_ENV_VAR)
+    if path:
+        return path
+    return os.path.join(core.get_user_data_dir(), "daemon_authkey")
+
+
+def read_authkey_file(path):
+    """Return the key in path, creating a random one if it doesn't exist."""
+    if not os.path.exists(path):
+        create_authkey_file(path)
+    with open(path, "rb") as key_file:
+        authkey = key_file.read().strip()
+    if not authkey:
+        raise PsseDaemonError("Authkey file %s is empty" % (path,))
+    return authkey
+
+
+def create_authkey_file(path):
+    key_dir = os.path.dirname(path)
+    if key_dir and not os.path.isdir(key_dir):
+        os.makedirs(key_dir, 0o700)
+    # mkstemp files are only readable by the current user.
+    fd, temp_path = tempfile.mkstemp(dir=key_dir or None, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as key_file:
+            key_file.write(binascii.hexlify(os.urandom(AUTHKEY_BYTES)))
+        # Neither link nor rename on Windows replace an existing file, so a
+        # daemon and client starting together agree on one key.
+        try:
+            getattr(os, "link", os.rename)(temp_path, path)
+        except OSError:
+            if not os.path.exists(path):
+                raise
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_authkey(authkey=None):
+    """Return authkey, PSSEPATH_DAEMON_AUTHKEY or the per user key as bytes."""
+    if authkey is None:
+        authkey = os.environ.get(AUTHKEY_ENV_VAR)
+    if authkey is None:
+        return read_authkey_file(get_authkey_path())
+    if not isinstance(authkey, bytes):
+        authkey = authkey.encode("utf-8")
+    if not authkey:
+        raise PsseDaemonError("The daemon authkey can't be empty")
+    return authkey
+
+
+def run_calls(psspy, calls):
+    """Run a job's calls in order and return their results."""
+    results = []
+    for call in calls:
+        fn, args, kwargs = normalize_call(call)
+        results.append(resolve_call(psspy, fn)(*args, **kwargs))
+    return results
+
+
+def send_error(conn, exc):
+    """Send an exception back, falling back to PsseDaemonError if it won't pickle."""
+    remote_traceback = traceback.format_exc()
+    try:
+        conn.send(("error", (exc, remote_traceback)))
+    except Exception:
+        conn.send(("error", (PsseDaemonError(repr(exc)), remote_traceback)))
+
+
+def session_worker(conn, psse_version, psseinit_buses):
+    """Entry point of a session process."""
+    try:
+        core.add_pssepath(psse_version)
+        import psspy
+
+        if psseinit_buses:
+            psspy.psseinit(psseinit_buses)
+    except Exception as exc:
+        send_error(conn, exc)
+        return
+    conn.send(("ready", os.environ.get(core.SELECTION_ENV_VAR)))
+
+    while True:
+        try:
+            calls = conn.recv()
+        except EOFError:
+            break
+        if calls is None:
+            break
+        try:
+            results = run_calls(psspy, calls)
+        except Exception as exc:
+            send_error(conn, exc)
+        else:
+            try:
+                conn.send(("ok", results))
+            except (pickle.PicklingError, TypeError, AttributeError) as exc:
+                # Connection.send() pickles before writing, so the pipe is
+                # still usable.
+                send_error(
+                    conn, PsseDaemonError("Job results can't be pickled: %r" % (exc,))
+                )
+
+
+class FairQueue(object):
+    """Round-robin across clients, first in first out within a client."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._order = deque()
+        self._closed = False
+
+    def put(self, client_id, item):
+        with self._cond:
+            if client_id not in self._queues:
+                self._queues[client_id] = deque()
+                self._order.append(client_id)
+            self._queues[client_id].append(item)
+            self._cond.notify()
+
+    def get(self):
+        """Return the next item or None once closed."""
+        with self._cond:
+            while not self._order and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            client_id = self._order.popleft()
+            client_queue = self._queues[client_id]
+            item = client_queue.popleft()
+            if client_queue:
+                # Back of the line for this client's next job.
+                self._order.append(client_id)
+            else:
+                del self._queues[client_id]
+            return item
+
+    def discard(self, client_id):
+        """Drop the jobs still queued for a client that went away."""
+        with self._cond:
+            if self._queues.pop(client_id, None) is not None:
+                self._order.remove(client_id)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Session(object):
+    """A session process and the pipe used to send it jobs."""
+
+    def __init__(self, psse_version, psseinit_buses):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=session_worker, args=(child_conn, psse_version, psseinit_buses)
+        )
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+        status, payload = self.conn.recv()
+        if status != "ready":
+            exc, remote_traceback = payload
+            logger.error("PSSE session failed to start:\n%s", remote_traceback)
+            raise exc
+        if payload and not os.environ.get(core.SELECTION_ENV_VAR):
+            # Later sessions inherit the selection and skip discovery.
+            os.environ[core.SELECTION_ENV_VAR] = payload
+
+    def run(self, calls):
+        self.conn.send(calls)
+        return self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (IOError, OSError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class PsseDaemon(object):
+    """Serve jobs to a pool of warm psspy sessions over a local connection."""
+
+    def __init__(
+        self,
+        address=DEFAULT_ADDRESS,
+        sessions=1,
+        psse_version=None,
+        psseinit_buses=None,
+        authkey=None,
+    ):
+        self.address = address
+        self.num_sessions = sessions
+        self.psse_version = psse_version
+        self.psseinit_buses = psseinit_buses
+        self.authkey = get_authkey(authkey)
+        self._jobs = FairQueue()
+        self._sessions = []
+        self._stopping = False
+        self._listener = None
+
+    def start_session(self):
+        return Session(self.psse_version, self.psseinit_buses)
+
+    def serve_forever(self):
+        self._sessions = [self.start_session() for _ in range(self.num_sessions)]
+        for index in range(self.num_sessions):
+            thread = threading.Thread(target=self._dispatch, args=(index,))
+            thread.daemon = True
+            thread.start()
+
+        self._listener = Listener(self.address, authkey=self.authkey)
+        # Listener may pick the address (eg. port 0), report the real one.
+        self.address = self._listener.address
+        logger.info(
+            "pssepath daemon listening on %s with %i session(s)",
+            self.address,
+            self.num_sessions,
+        )
+        client_id = 0
+        try:
+            while not self._stopping:
+                try:
+                    conn = self._listener.accept()
+                except Exception:
+                    if self._stopping:
+                        break
+                    logger.warning("Rejected daemon connection", exc_info=True)
+                    continue
+                client_id += 1
+                thread = threading.Thread(
+                    target=self._handle_client, args=(conn, client_id)
+                )
+                thread.daemon = True
+                thread.start()
+        finally:
+            self._jobs.close()
+            self._listener.close()
+            for session in self._sessions:
+                session.stop()
+
+    def stop(self):
+        """Stop serve_forever() from another thread."""
+        self._stopping = True
+        try:
+            # Wake the blocking accept().
+            Client(self.address, authkey=self.authkey).close()
+        except Exception:
+            pass
+
+    def _handle_client(self, conn, client_id):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                job_id, calls = conn.recv()
+                self._jobs.put(client_id, (conn, send_lock, job_id, calls))
+        except (EOFError, IOError, OSError):
+            pass
+        finally:
+            self._jobs.discard(client_id)
+
+    def _dispatch(self, index):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            conn, send_lock, job_id, calls = job
+            session = self._sessions[index]
+            try:
+                status, result = session.run(calls)
+            except (EOFError, IOError, OSError):
+                logger.error("PSSE session exited, starting a new one.")
+                status = "error"
+                result = (PsseDaemonError("The PSSE session running the job exited."), "")
+                session.stop()
+                try:
+                    self._sessions[index] = self.start_session()
+                except Exception:
+                    logger.exception("Could not restart the PSSE session.")
+                    self._reply(conn, send_lock, job_id, status, result)
+                    break
+            self._reply(conn, send_lock, job_id, status, result)
+
+    def _reply(self, conn, send_lock, job_id, status, result):
+        with send_lock:
+            try:
+                conn.send((job_id, status, result))
+            except (IOError, OSError):
+                # Client went away, nothing to tell.
+                pass
+
+
+class RemotePsspy(object):
+    """psspy look-alike that runs each call in the daemon."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def remote_call(*args, **kwargs):
+            return self._client.call(name, *args, **kwargs)
+
+        return remote_call
+
+
+class DaemonClient(object):
+    """Submit jobs to a running PsseDaemon."""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self._conn = Client(address, authkey=get_authkey(authkey))
+        self._lock = threading.Lock()
+        self._job_id = 0
+        self.psspy = RemotePsspy(self)
+
+    def call_batch(self, calls):
+        """Run [(fn, args, kwargs), ...] as one job and return the results.
+
+        fn is a psspy function name or a picklable callable. args and kwargs
+        may be left off each call.
+        """
+        with self._lock:
+            self._job_id += 1
+            self._conn.send((self._job_id, [tuple(call) for call in calls]))
+            job_id, status, result = self._conn.recv()
+        if status == "error":
+            exc, remote_traceback = result
+            if remote_traceback:
+                logger.debug("Daemon job failed:\n%s", remote_traceback)
+            raise exc
+        return result
+
+    def call(self, fn, *args, **kwargs):
+        return self.call_batch([(fn, args, kwargs)])[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def parse_psse_version(value):
+    version = float(value)
+    if version.is_integer():
+        return int(version)
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Keep initialised psspy sessions available to DaemonClient."
+    )
+    parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--psse-version", type=parse_psse_version, default=None)
+    parser.add_argument(
+        "--buses", type=int, default=None, help="run psspy.psseinit(BUSES) in each session"
+    )
+    args = parser.parse_args(argv)
+
+    daemon = PsseDaemon(
+        address=args.address,
+        sessions=args.sessions,
+        psse_version=args.psse_version,
+        psseinit_buses=args.buses,
+    )
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    main()
@@ -0,0 +1,157 @@
+"""Read and change individual network elements through psspy.
+
+Each ElementKind knows how to read a set of fields of one element and how
+to write any of them back with a single psspy *_chng call. Elements are
+identified by a key:
+
+    bus       bus number
+    load      (bus number, load id)
+    machine   (bus number, machine id)
+    branch    (from bus number, to bus number, circuit id)
+
+Fields:
+
+    bus       VM (pu), VA (degrees), TYPE
+    load      PL, QL (constant power MW and Mvar), STATUS
+    machine   PG, QG, PT, PB, STATUS
+    branch    STATUS
+
+The newest *_chng function the PSSE version provides is used, called with
+psspy's intgarN/realarN keywords so only the given fields change.
+"""
+from .core import PsspyError
+
+
+def checked(fn_name, result):
+    """Return the value of a psspy (ierr, value) result, raising on ierr."""
+    ierr, value = result
+    if ierr:
+        raise PsspyError("psspy.%s returned ierr=%s" % (fn_name, ierr), ierr)
+    return value
+
+
+def find_function(psspy, names):
+    for name in names:
+        fn = getattr(psspy, name, None)
+        if fn is not None:
+            return name, fn
+    raise AttributeError("psspy has none of %s" % (", ".join(names),))
+
+
+def call_reader(fn_name, *extra_args):
+    """Return a reader calling psspy.fn_name(*key, *extra_args)."""
+
+    def read(psspy, key):
+        return checked(fn_name, getattr(psspy, fn_name)(*(key + extra_args)))
+
+    return read
+
+
+def complex_part(fn_name, part, *extra_args):
+    def read(psspy, key):
+        value = checked(fn_name, getattr(psspy, fn_name)(*(key + extra_args)))
+        return value.real if part == "real" else value.imag
+
+    return read
+
+
+class ElementKind(object):
+    """How to read and write the fields of one type of element.
+
+    fields: {field: (reader, keyword)} where reader(psspy, key) returns the
+        value and keyword is the *_chng argument setting it (eg. realar1).
+    write_functions: *_chng function names, newest first.
+    """
+
+    def __init__(self, name, fields, write_functions):
+        self.name = name
+        self.fields = fields
+        self.write_functions = write_functions
+
+    def normalize_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        return tuple(key)
+
+    def read(self, psspy, key, field_names):
+        key = self.normalize_key(key)
+        return dict(
+            (field, self.fields[field][0](psspy, key)) for field in field_names
+        )
+
+    def check_fields(self, field_names):
+        for field in field_names:
+            if field not in self.fields:
+                raise ValueError("%s has no field %r" % (self.name, field))
+
+    def writer(self, psspy):
+        """Return write(key, values) -> ierr using psspy's *_chng function.
+
+        Looks the function up once, for writing many elements.
+        """
+        fn_name, fn = find_function(psspy, self.write_functions)
+        keywords = dict((field, spec[1]) for field, spec in self.fields.items())
+
+        def write(key, values):
+            self.check_fields(values)
+            kwargs = dict((keywords[field], value) for field, value in values.items())
+            result = fn(*self.normalize_key(key), **kwargs)
+            if isinstance(result, tuple):
+                result = result[0]
+            return result
+
+        return write
+
+    def write(self, psspy, key, values):
+        """Write {field: value} with one psspy call and return its ierr."""
+        return self.writer(psspy)(key, values)
+
+
+ELEMENT_KINDS = {
+    "bus": ElementKind(
+        "bus",
+        {
+            "VM": (call_reader("busdat", "PU"), "realar2"),
+            "VA": (call_reader("busdat", "ANGLED"), "realar3"),
+            "TYPE": (call_reader("busint", "TYPE"), "intgar1"),
+        },
+        ("bus_chng_4", "bus_chng_3"),
+    ),
+    "load": ElementKind(
+        "load",
+        {
+            "PL": (complex_part("loddt2", "real", "MVA", "NOM"), "realar1"),
+            "QL": (complex_part("loddt2", "imag", "MVA", "NOM"), "realar2"),
+            "STATUS": (call_reader("lodint", "STATUS"), "intgar1"),
+        },
+        ("load_chng_6", "load_chng_5", "load_chng_4"),
+    ),
+    "machine": ElementKind(
+        "machine",
+        {
+            "PG": (call_reader("macdat", "P"), "realar1"),
+            "QG": (call_reader("macdat", "Q"), "realar2"),
+            "PT": (call_reader("macdat", "PMAX"), "realar5"),
+            "PB": (call_reader("macdat", "PMIN"), "realar6"),
+            "STATUS": (call_reader("macint", "STATUS"), "intgar1"),
+        },
+        ("machine_chng_4", "machine_chng_3", "machine_chng_2"),
+    ),
+    "branch": ElementKind(
+        "branch",
+        {
+            "STATUS": (call_reader("brnint", "STATUS"), "intgar1"),
+        },
+        ("branch_chng_3", "branch_chng"),
+    ),
+}
+
+
+def get_element_kind(kind):
+    try:
+        return ELEMENT_KINDS[kind]
+    except KeyError:
+        raise ValueError(
+            "Unknown element kind %r, use one of %s"
+            % (kind, ", ".join(sorted(ELEMENT_KINDS)))
+        )
@@ -0,0 +1,271 @@
+"""Run psspy on one dedicated thread.
+
+psspy is not thread-safe. A PsspyExecutor owns psspy on its own thread and
+every other thread hands it work, getting concurrent.futures.Future objects
+back:
+
+    import pssepath
+    pssepath.add_pssepath()
+    executor = pssepath.start_psspy_executor(init=lambda psspy: psspy.psseinit(50000))
+
+    ierr = executor.call("case", r"c:\\cases\\base.sav")
+    future = executor.submit("fnsl")
+
+    with executor.batch() as batch:
+        results = [batch.busdat(bus, "PU") for bus in buses]
+    voltages = [result.result() for result in results]
+
+Work submitted by a batch is handed over as a single queue item, and the
+psspy thread drains everything already waiting each time it wakes up, so
+fine-grained calls don't each pay for a thread switch.
+"""
+import threading
+
+try:
+    import queue
+except ImportError:
+    # Py2
+    import Queue as queue
+
+from concurrent.futures import Future
+
+from . import core
+
+
+_STOP = object()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def normalize_call(call):
+    """Return (fn, args, kwargs) from a call where args and kwargs are optional."""
+    fn = call[0]
+    args = call[1] if len(call) > 1 else ()
+    kwargs = call[2] if len(call) > 2 else {}
+    return fn, args, kwargs
+
+
+def resolve_call(psspy, fn):
+    """Return the callable for fn, which is a psspy function name or a callable."""
+    if callable(fn):
+        return fn
+    return getattr(psspy, fn)
+
+
+class CallBatch(object):
+    """Collects calls to hand over to the psspy thread in one go.
+
+    Attribute access returns a function that queues the psspy call of that
+    name and returns its future. Nothing runs until the batch is submitted,
+    which happens when leaving the 'with' block.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._calls = []
+        self._futures = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def queue_call(*args, **kwargs):
+            return self.add(name, *args, **kwargs)
+
+        return queue_call
+
+    def add(self, fn, *args, **kwargs):
+        future = Future()
+        self._calls.append((fn, args, kwargs))
+        self._futures.append(future)
+        return future
+
+    def submit(self):
+        calls, futures = self._calls, self._futures
+        self._calls, self._futures = [], []
+        if calls:
+            self._executor._put((calls, futures))
+        return futures
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.submit()
+        else:
+            for future in self._futures:
+                future.cancel()
+
+
+class PsspyProxy(object):
+    """psspy look-alike whose functions return futures from the executor."""
+
+    def __init__(self, executor):
+        self._executor = executor
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def submit_call(*args, **kwargs):
+            return self._executor.submit(name, *args, **kwargs)
+
+        return submit_call
+
+
+class PsspyExecutor(object):
+    """Owns psspy on a single thread and runs the work submitted to it.
+
+    init: called with the psspy module on the psspy thread before any other
+        work, eg. to run psspy.psseinit().
+    max_batch: the most queued items run per wake up of the psspy thread.
+    """
+
+    def __init__(self, init=None, max_batch=256, name="psspy-executor"):
+        self._init = init
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._started = Future()
+        self._shutdown = False
+        self._shutdown_lock = threading.Lock()
+        self.psspy = None
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+
+    def start(self):
+        """Start the psspy thread and wait until psspy is imported and initialised.
+
+        Errors raised by the import or by init are raised here.
+        """
+        self._thread.start()
+        self._started.result()
+        return self
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def in_executor_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _put(self, item):
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit psspy calls after shutdown.")
+            self._queue.put(item)
+
+    def _run(self):
+        try:
+            import psspy
+
+            if self._init is not None:
+                self._init(psspy)
+        except BaseException as exc:
+            self._started.set_exception(exc)
+            return
+        self.psspy = psspy
+        self._started.set_result(None)
+
+        get = self._queue.get
+        get_nowait = self._queue.get_nowait
+        while True:
+            work = [get()]
+            # Coalesce: run everything that queued up while we were busy.
+            while len(work) < self._max_batch:
+                try:
+                    work.append(get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in work:
+                if item is _STOP:
+                    return
+                self._run_calls(*item)
+
+    def _run_calls(self, calls, futures):
+        psspy = self.psspy
+        for (fn, args, kwargs), future in zip(calls, futures):
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = resolve_call(psspy, fn)(*args, **kwargs)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) on the psspy thread and return a Future.
+
+        fn is either the name of a psspy function or a callable, which is run
+        on the psspy thread.
+        """
+        future = Future()
+        self._put(([(fn, args, kwargs)], [future]))
+        return future
+
+    def submit_batch(self, calls):
+        """Queue [(fn, args, kwargs), ...] as one handoff and return their futures.
+
+        args and kwargs may be left off each call.
+        """
+        batch = CallBatch(self)
+        for call in calls:
+            fn, args, kwargs = normalize_call(call)
+            batch.add(fn, *args, **kwargs)
+        return batch.submit()
+
+    def batch(self):
+        """Return a CallBatch, submitted when its 'with' block exits."""
+        return CallBatch(self)
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn on the psspy thread and return its result.
+
+        Runs directly when already on the psspy thread instead of
+        deadlocking on its own queue.
+        """
+        if self.in_executor_thread():
+            return resolve_call(self.psspy, fn)(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def proxy(self):
+        """Return a psspy look-alike whose calls return futures."""
+        return PsspyProxy(self)
+
+    def shutdown(self, wait=True):
+        """Stop the psspy thread after the already submitted work has run."""
+        with self._shutdown_lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            self._queue.put(_STOP)
+        if wait and not self.in_executor_thread():
+            self._thread.join()
+
+
+def start_psspy_executor(init=None, max_batch=256):
+    """Return the process wide PsspyExecutor, starting it if required.
+
+    Must be called after add_pssepath(). Once started, psspy should only be
+    used through the executor.
+    """
+    global _executor
+
+    if not core.INITIALIZED:
+        raise core.PsseImportError(
+            "Run pssepath.add_pssepath() before starting the psspy executor."
+        )
+
+    with _executor_lock:
+        if _executor is None or not _executor.is_alive():
+            _executor = PsspyExecutor(init=init, max_batch=max_batch).start()
+    return _executor
+
+
+def get_psspy_executor():
+    """Return the running process wide PsspyExecutor or None."""
+    if _executor is not None and _executor.is_alive():
+        return _executor
+    return None
@@ -1,17 +1,24 @@
 from __future__ import with_statement
 
+import errno
 import platform
 import struct
 import os
 import sys
+from collections import namedtuple
 from functools import wraps
 
 try:
     # Py2
     import _winreg as winreg
 except ImportError:
-    # Py3
-    import winreg
+    try:
+        # Py3
+        import winreg
+    except ImportError:
+        # Not Windows: only the parts of pssepath that don't search the
+        # registry for installs work, eg. reading PSSE output files.
+        winreg = None
 
 
 def memoize(fn):
@@ -36,6 +43,7 @@ def memoize(fn):
             cache[key] = fn(*args, **kwargs)
         return cache[key]
 
+    wrap.cache_clear = cache.clear
     return wrap
 
 
@@ -49,10 +57,153 @@ def run_once(fn):
     return wrapped
 
 
+InterpreterFingerprint = namedtuple(
+    "InterpreterFingerprint", ["version", "nbits", "implementation", "abi_tag"]
+)
+
+
+@memoize
+def get_interpreter_fingerprint():
+    """Return the running interpreter's InterpreterFingerprint.
+
+    eg. ("3.9", "64bit", "CPython", "cp39-win_amd64"). Worked out once per
+    process without starting a subprocess, unlike platform.architecture()
+    which runs 'file' outside of Windows.
+    """
+    version = "%s.%s" % sys.version_info[:2]
+    nbits = "%ibit" % (struct.calcsize("P") * 8,)
+    implementation = platform.python_implementation()
+    return InterpreterFingerprint(version, nbits, implementation, get_abi_tag())
+
+
+def get_abi_tag():
+    """Return the C extension ABI tag, ie. sysconfig's SOABI.
+
+    eg. "cp39-win_amd64" or "cpython-39-x86_64-linux-gnu". Read from the
+    extension module suffixes importlib already knows, as loading sysconfig
+    takes milliseconds.
+    """
+    try:
+        from importlib.machinery import EXTENSION_SUFFIXES
+    except ImportError:
+        EXTENSION_SUFFIXES = []
+    for suffix in EXTENSION_SUFFIXES:
+        # eg. ".cp39-win_amd64.pyd", "_d.cp39-win_amd64.pyd" or ".abi3.so"
+        parts = suffix.split(".")
+        if len(parts) == 3 and parts[1] != "abi3":
+            return parts[1]
+
+    import sysconfig
+
+    soabi = sysconfig.get_config_var("SOABI")
+    if soabi:
+        return soabi
+    # Python 2 has neither.
+    major, minor = sys.version_info[:2]
+    return "cp%i%i%s" % (major, minor, getattr(sys, "abiflags", ""))
+
+
 def get_python_ver():
     """Returns (python_version, nbits) eg. ("2.7", "32bit")"""
-    py_ver = "%s.%s" % sys.version_info[:2]
-    return py_ver, platform.architecture()[0]
+    fingerprint = get_interpreter_fingerprint()
+    return fingerprint.version, fingerprint.nbits
+
+
+@memoize
+def get_kernel32():
+    """Return (OpenProcess, GetExitCodeProcess, GetProcessTimes, CloseHandle)."""
+    import ctypes
+    from ctypes import wintypes
+
+    # Own instance so the prototypes don't change ctypes.windll for others,
+    # and so ctypes.get_last_error() reads the error of these calls.
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+    open_process = kernel32.OpenProcess
+    open_process.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    open_process.restype = wintypes.HANDLE
+
+    get_exit_code = kernel32.GetExitCodeProcess
+    get_exit_code.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+    get_exit_code.restype = wintypes.BOOL
+
+    get_times = kernel32.GetProcessTimes
+    get_times.argtypes = [wintypes.HANDLE] + [ctypes.POINTER(wintypes.FILETIME)] * 4
+    get_times.restype = wintypes.BOOL
+
+    close_handle = kernel32.CloseHandle
+    close_handle.argtypes = [wintypes.HANDLE]
+    close_handle.restype = wintypes.BOOL
+
+    return open_process, get_exit_code, get_times, close_handle
+
+
+def pid_is_alive(pid):
+    """Return True if a process with this pid is running on this machine."""
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        ERROR_ACCESS_DENIED = 5
+        open_process, get_exit_code, _, close_handle = get_kernel32()
+        handle = open_process(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Can't open another user's process, but it does exist.
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = wintypes.DWORD()
+            if not get_exit_code(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            close_handle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+
+def get_process_start_time(pid):
+    """Return when process pid started as a string, or None if unknown.
+
+    Only comparable with other values from this function on the same
+    machine. Together with the pid it tells a process apart from a later
+    one given the same pid.
+    """
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        open_process, _, get_times, close_handle = get_kernel32()
+        handle = open_process(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            times = [wintypes.FILETIME() for _ in range(4)]
+            if not get_times(handle, *[ctypes.byref(item) for item in times]):
+                return None
+            created = times[0]
+            return str((created.dwHighDateTime << 32) | created.dwLowDateTime)
+        finally:
+            close_handle(handle)
+
+    try:
+        with open("/proc/%i/stat" % (pid,)) as stat_file:
+            stat = stat_file.read()
+    except (IOError, OSError):
+        return None
+    # The command name in brackets may hold spaces. starttime is the 22nd
+    # field, in clock ticks since boot.
+    fields = stat[stat.rfind(")") + 2 :].split()
+    try:
+        return fields[19]
+    except IndexError:
+        return None
 
 
 # winreg helpers:
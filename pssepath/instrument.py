@@ -0,0 +1,251 @@
+"""Opt-in instrumentation of psspy calls.
+
+    import pssepath
+    pssepath.add_pssepath()
+    pssepath.instrument_psspy(sample_every=10)
+
+    import psspy  # the instrumented proxy
+    ...
+    psspy.dump_stats()
+
+Every call is counted. Only every 'sample_every'th call of each function is
+timed, so chatty loops pay for a counter increment and an integer check on
+most calls. Set sample_every=0 to only count calls and return codes.
+"""
+import atexit
+import sys
+import time
+from collections import deque
+
+from . import core
+
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+def get_ierr(result):
+    """Return the non-zero integer return code of a psspy call or 0.
+
+    psspy functions return either ierr or a tuple of (ierr, values...).
+    """
+    if type(result) is int:
+        return result
+    if type(result) is tuple and result and type(result[0]) is int:
+        return result[0]
+    return 0
+
+
+class CallStats(object):
+    """Counters and sampled latencies for one psspy function."""
+
+    __slots__ = ("name", "calls", "sampled", "sampled_time", "latencies", "errors")
+
+    def __init__(self, name, max_samples):
+        self.name = name
+        self.calls = 0
+        self.sampled = 0
+        self.sampled_time = 0.0
+        self.latencies = deque(maxlen=max_samples)
+        self.errors = {}
+
+    def add_sample(self, elapsed):
+        self.sampled += 1
+        self.sampled_time += elapsed
+        self.latencies.append(elapsed)
+
+    def add_error(self, ierr):
+        self.errors[ierr] = self.errors.get(ierr, 0) + 1
+
+    def as_dict(self):
+        """Return the stats with times in seconds.
+
+        'total_time' is an estimate extrapolated from the sampled calls when
+        not every call is timed.
+        """
+        latencies = sorted(self.latencies)
+        if self.sampled:
+            mean = self.sampled_time / self.sampled
+            total_time = mean * self.calls
+        else:
+            mean = total_time = None
+        return {
+            "calls": self.calls,
+            "sampled": self.sampled,
+            "total_time": total_time,
+            "mean": mean,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "errors": dict(self.errors),
+        }
+
+
+class InstrumentedPsspy(object):
+    """Proxy for the psspy module that records per function call stats.
+
+    sample_every: time every Nth call of each function (0 to disable timing).
+    max_samples: number of recent latencies kept per function for the
+        percentiles.
+    callback: called with the output of stats() by flush().
+    """
+
+    def __init__(self, psspy, sample_every=1, max_samples=1000, callback=None):
+        self.__dict__["wrapped"] = psspy
+        self.__dict__["sample_every"] = sample_every
+        self.__dict__["max_samples"] = max_samples
+        self.__dict__["callback"] = callback
+        self.__dict__["_stats"] = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self.wrapped, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        wrapper = self._wrap(name, attr)
+        # Cache on the instance so later lookups skip __getattr__.
+        self.__dict__[name] = wrapper
+        return wrapper
+
+    def __setattr__(self, name, value):
+        setattr(self.wrapped, name, value)
+
+    def __dir__(self):
+        return dir(self.wrapped)
+
+    def _wrap(self, name, fn):
+        stats = self._stats.setdefault(name, CallStats(name, self.max_samples))
+        sample_every = self.sample_every
+
+        def wrapper(*args, **kwargs):
+            stats.calls += 1
+            if sample_every and not stats.calls % sample_every:
+                start = clock()
+                result = fn(*args, **kwargs)
+                stats.add_sample(clock() - start)
+            else:
+                result = fn(*args, **kwargs)
+            ierr = get_ierr(result)
+            if ierr:
+                stats.add_error(ierr)
+            return result
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = getattr(fn, "__doc__", None)
+        return wrapper
+
+    def stats(self):
+        """Return {function name: stats dict} for every called function."""
+        return dict(
+            (name, stats.as_dict())
+            for name, stats in self._stats.items()
+            if stats.calls
+        )
+
+    def forget_wrappers(self, names=None):
+        """Drop cached wrappers so functions replaced on the wrapped module are used.
+
+        names: the function names, every cached wrapper by default.
+        """
+        if names is None:
+            names = list(self._stats)
+        for name in names:
+            self.__dict__.pop(name, None)
+
+    def reset_stats(self):
+        for name, stats in list(self._stats.items()):
+            self._stats[name] = CallStats(name, self.max_samples)
+        # The cached wrappers hold the old stats objects.
+        self.forget_wrappers()
+
+    def report(self):
+        """Return a text table of the stats, most expensive function first."""
+
+        def ms(value):
+            if value is None:
+                return "-"
+            return "%.3f" % (value * 1000.0)
+
+        all_stats = self.stats()
+        order = sorted(
+            all_stats,
+            key=lambda name: (all_stats[name]["total_time"] or 0.0, all_stats[name]["calls"]),
+            reverse=True,
+        )
+        lines = [
+            "%-24s %10s %12s %10s %10s %10s  %s"
+            % ("function", "calls", "total ms", "p50 ms", "p90 ms", "p99 ms", "ierr")
+        ]
+        for name in order:
+            stats = all_stats[name]
+            errors = ", ".join(
+                "%s:%s" % (ierr, count) for ierr, count in sorted(stats["errors"].items())
+            )
+            lines.append(
+                "%-24s %10i %12s %10s %10s %10s  %s"
+                % (
+                    name,
+                    stats["calls"],
+                    ms(stats["total_time"]),
+                    ms(stats["p50"]),
+                    ms(stats["p90"]),
+                    ms(stats["p99"]),
+                    errors,
+                )
+            )
+        return "\n".join(lines)
+
+    def dump_stats(self, stream=None):
+        """Write report() to stream (sys.stderr by default)."""
+        if stream is None:
+            stream = sys.stderr
+        stream.write(self.report() + "\n")
+
+    def flush(self):
+        """Hand the current stats to the callback, if there is one."""
+        if self.callback is not None:
+            self.callback(self.stats())
+
+
+def instrument_psspy(sample_every=1, max_samples=1000, callback=None, report_at_exit=False):
+    """Replace psspy in sys.modules with an InstrumentedPsspy proxy.
+
+    Call after add_pssepath() and before psspy is imported elsewhere; modules
+    that already imported psspy keep the uninstrumented module.
+    """
+    if not core.INITIALIZED:
+        raise core.PsseImportError(
+            "Run pssepath.add_pssepath() before instrumenting psspy."
+        )
+
+    current = sys.modules.get("psspy")
+    if isinstance(current, InstrumentedPsspy):
+        return current
+
+    import psspy
+
+    proxy = InstrumentedPsspy(
+        psspy, sample_every=sample_every, max_samples=max_samples, callback=callback
+    )
+    sys.modules["psspy"] = proxy
+    if report_at_exit:
+        atexit.register(proxy.dump_stats)
+    if callback is not None:
+        atexit.register(proxy.flush)
+    return proxy
+
+
+def uninstrument_psspy():
+    """Put the real psspy module back in sys.modules."""
+    current = sys.modules.get("psspy")
+    if isinstance(current, InstrumentedPsspy):
+        sys.modules["psspy"] = current.wrapped
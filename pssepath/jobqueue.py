@@ -0,0 +1,714 @@
+"""Spread PSSE jobs over workers on many machines.
+
+Jobs go to a broker. Workers on each machine initialise PSSE once, take jobs
+from the broker a few at a time and send back the results:
+
+    # on each node
+    python -m pssepath.jobqueue work \\\\fileserver\\queue --psse-version 35 --buses 50000
+
+    # to submit work
+    from pssepath.jobqueue import JobQueue, open_broker
+
+    queue = JobQueue(open_broker(r"\\\\fileserver\\queue"))
+    job_ids = queue.map(my_study.run_contingency, contingencies, psse_version=35)
+    results = queue.gather(job_ids)
+
+A job is a list of calls like DaemonClient.call_batch() takes: psspy
+function names or picklable callables (importable on the workers), with
+their arguments. queue.gather() returns each job's list of call results.
+
+Brokers:
+
+    DirectoryBroker   a directory every node can reach, eg. a network share.
+                      Jobs are files, claimed by renaming them.
+    TcpBroker         a BrokerServer started with
+                      "python -m pssepath.jobqueue serve --address host:port",
+                      opened as open_broker("tcp://host:port").
+
+Jobs asking for a PSSE version only go to workers running that version.
+Workers take those before jobs that don't mind. If a worker stops sending
+heartbeats, its unfinished jobs are handed out again, up to max_attempts, and
+results it sends for them later are dropped. Jobs that raise are not
+retried.
+
+Anything that can submit jobs can run code on the workers: keep queue
+directories private. TCP brokers on anything but a loopback address need an
+explicit authkey, passed as authkey= or set in PSSEPATH_DAEMON_AUTHKEY on
+the server, the workers and the submitters. Loopback brokers otherwise use
+the current user's daemon key (see pssepath.daemon).
+"""
+import argparse
+import logging
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing.connection import Client, Listener
+
+from . import core
+from .daemon import AUTHKEY_ENV_VAR, get_authkey, parse_psse_version, run_calls
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 6150
+# Methods a BrokerServer lets TcpBroker call.
+BROKER_METHODS = (
+    "submit",
+    "claim",
+    "heartbeat",
+    "complete",
+    "pop_results",
+    "requeue_lost",
+    "unregister",
+)
+
+
+class JobError(Exception):
+    pass
+
+
+def new_job(calls, psse_version=None, max_attempts=3):
+    return {
+        "id": uuid.uuid4().hex,
+        "calls": [tuple(call) for call in calls],
+        "psse_version": psse_version,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+    }
+
+
+def version_matches(wanted, running):
+    """True if a job wanting PSSE 'wanted' can run on PSSE 'running'.
+
+    A whole version (35) accepts any point version (35.5).
+    """
+    if wanted is None:
+        return True
+    if running is None:
+        return False
+    return wanted == running or (float(wanted).is_integer() and int(running) == wanted)
+
+
+def order_for_worker(jobs, psse_version, version_of=lambda job: job["psse_version"]):
+    """Return the jobs a worker can run, those asking for its version first."""
+    pinned = []
+    anywhere = []
+    for job in jobs:
+        wanted = version_of(job)
+        if wanted is None:
+            anywhere.append(job)
+        elif version_matches(wanted, psse_version):
+            pinned.append(job)
+    return pinned + anywhere
+
+
+def lost_result(job):
+    return (
+        "error",
+        (JobError("Job %s lost with its worker %i times" % (job["id"], job["attempts"])), ""),
+    )
+
+
+def error_result(exc):
+    remote_traceback = traceback.format_exc()
+    try:
+        pickle.dumps(exc)
+    except Exception:
+        exc = JobError(repr(exc))
+    return ("error", (exc, remote_traceback))
+
+
+class DirectoryBroker(object):
+    """Broker keeping jobs as files in a shared directory.
+
+        pending/    jobs waiting for a worker
+        claimed/    a dir per worker, jobs move here with an atomic rename
+        workers/    a heartbeat file per worker, touched while it runs
+        results/    a file per finished job
+    """
+
+    def __init__(self, directory, stale_after=60.0):
+        self.directory = directory
+        self.stale_after = stale_after
+        self._last_requeue = 0
+        for name in ("pending", "claimed", "workers", "results", "tmp"):
+            path = os.path.join(directory, name)
+            if not os.path.isdir(path):
+                try:
+                    os.makedirs(path)
+                except OSError:
+                    # Made by another node at the same time.
+                    if not os.path.isdir(path):
+                        raise
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def write_temp(self, value):
+        """Pickle value to a new file in tmp/ and return its path."""
+        fd, temp_path = tempfile.mkstemp(dir=self.path("tmp"))
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                pickle.dump(value, temp_file, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return temp_path
+
+    def write(self, path, value):
+        """Write value to path so readers never see part of it."""
+        temp_path = self.write_temp(value)
+        try:
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def read(self, path):
+        with open(path, "rb") as job_file:
+            return pickle.load(job_file)
+
+    def job_name(self, job):
+        # Sorts in submission order. The version is in the name so workers
+        # can choose jobs without reading them.
+        version = "any" if job["psse_version"] is None else str(job["psse_version"])
+        return "%020i_%s_%s.job" % (int(time.time() * 1e6), version, job["id"])
+
+    def submit(self, jobs):
+        for job in jobs:
+            job = dict(job)
+            job["name"] = self.job_name(job)
+            self.write(self.path("pending", job["name"]), job)
+
+    def claim(self, worker_id, psse_version, max_jobs):
+        self.heartbeat(worker_id)
+        claimed_dir = self.path("claimed", worker_id)
+        if not os.path.isdir(claimed_dir):
+            os.makedirs(claimed_dir)
+
+        def version_of(name):
+            version = name.split("_")[1]
+            return None if version == "any" else float(version)
+
+        jobs = []
+        names = sorted(os.listdir(self.path("pending")))
+        for name in order_for_worker(names, psse_version, version_of):
+            if len(jobs) >= max_jobs:
+                break
+            claimed_path = os.path.join(claimed_dir, name)
+            try:
+                os.rename(self.path("pending", name), claimed_path)
+            except OSError:
+                # Another worker got it first.
+                continue
+            jobs.append(self.read(claimed_path))
+        return jobs
+
+    def heartbeat(self, worker_id):
+        # Writing, unlike os.utime(), leaves the mtime to the file server,
+        # matching server_time().
+        with open(self.path("workers", worker_id), "w") as heartbeat_file:
+            heartbeat_file.write(worker_id)
+
+    def complete(self, worker_id, job, result):
+        """Store a job's result if worker_id still holds the job.
+
+        Returns False, dropping the result, if the job was handed out again
+        after this worker was thought lost.
+        """
+        # Written first, so a result that won't pickle leaves the claim alone.
+        temp_path = self.write_temp(result)
+        taken_path = self.take(self.path("claimed", worker_id, job["name"]))
+        if taken_path is None:
+            os.remove(temp_path)
+            logger.info(
+                "Dropping the result of job %s from worker %s, it was handed out again",
+                job["id"],
+                worker_id,
+            )
+            return False
+        os.replace(temp_path, self.path("results", job["id"]))
+        os.remove(taken_path)
+        return True
+
+    def pop_results(self, job_ids):
+        results = {}
+        for job_id in job_ids:
+            path = self.path("results", job_id)
+            try:
+                results[job_id] = self.read(path)
+            except (IOError, OSError):
+                continue
+            os.remove(path)
+        return results
+
+    def server_time(self):
+        """Return the time by the directory's clock, which all nodes share."""
+        fd, path = tempfile.mkstemp(dir=self.path("tmp"))
+        os.close(fd)
+        try:
+            return os.path.getmtime(path)
+        finally:
+            os.remove(path)
+
+    def requeue_lost(self):
+        """Hand out the jobs of workers without a recent heartbeat again."""
+        if time.time() - self._last_requeue < self.stale_after / 4.0:
+            return
+        self._last_requeue = time.time()
+        now = self.server_time()
+        for worker_id in os.listdir(self.path("claimed")):
+            try:
+                last_seen = os.path.getmtime(self.path("workers", worker_id))
+            except OSError:
+                last_seen = 0
+            if now - last_seen < self.stale_after:
+                continue
+            self.unregister(worker_id, lost=True)
+
+    def take(self, claimed_path):
+        """Move a claimed job to tmp/ and return its new path, None if it's gone.
+
+        Only one node can take a claimed job, so only one of them requeues
+        or completes it.
+        """
+        taken_path = self.path("tmp", "%s.%s" % (os.path.basename(claimed_path), uuid.uuid4().hex))
+        try:
+            os.rename(claimed_path, taken_path)
+        except OSError:
+            return None
+        return taken_path
+
+    def requeue(self, claimed_path, lost=True):
+        taken_path = self.take(claimed_path)
+        if taken_path is None:
+            return
+        job = self.read(taken_path)
+        if lost:
+            job["attempts"] += 1
+        if job["attempts"] >= job["max_attempts"]:
+            self.write(self.path("results", job["id"]), lost_result(job))
+        else:
+            logger.info("Requeuing job %s from %s", job["id"], claimed_path)
+            self.write(self.path("pending", job["name"]), job)
+        os.remove(taken_path)
+
+    def unregister(self, worker_id, lost=False):
+        """Forget a worker, handing out the jobs it didn't complete again.
+
+        lost: the worker stopped without unregistering, which counts as an
+            attempt at its jobs.
+        """
+        claimed_dir = self.path("claimed", worker_id)
+        try:
+            names = os.listdir(claimed_dir)
+        except OSError:
+            names = []
+        for name in names:
+            self.requeue(os.path.join(claimed_dir, name), lost)
+        try:
+            os.rmdir(claimed_dir)
+            os.remove(self.path("workers", worker_id))
+        except OSError:
+            pass
+
+
+class MemoryBroker(object):
+    """Broker keeping jobs in memory, shared by a BrokerServer."""
+
+    def __init__(self, stale_after=60.0):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._pending = []
+        # {job_id: (worker_id, job)}
+        self._claimed = {}
+        self._heartbeats = {}
+        self._results = {}
+
+    def submit(self, jobs):
+        with self._lock:
+            self._pending.extend(jobs)
+
+    def claim(self, worker_id, psse_version, max_jobs):
+        with self._lock:
+            self._heartbeats[worker_id] = time.time()
+            jobs = order_for_worker(self._pending, psse_version)[:max_jobs]
+            taken = set(job["id"] for job in jobs)
+            self._pending = [job for job in self._pending if job["id"] not in taken]
+            for job in jobs:
+                self._claimed[job["id"]] = (worker_id, job)
+            return jobs
+
+    def heartbeat(self, worker_id):
+        with self._lock:
+            self._heartbeats[worker_id] = time.time()
+
+    def complete(self, worker_id, job, result):
+        """Store a job's result if worker_id still holds the job.
+
+        Returns False, dropping the result, if the job was handed out again
+        after this worker was thought lost.
+        """
+        with self._lock:
+            claim = self._claimed.get(job["id"])
+            if claim is None or claim[0] != worker_id:
+                logger.info(
+                    "Dropping the result of job %s from worker %s, it was handed out again",
+                    job["id"],
+                    worker_id,
+                )
+                return False
+            del self._claimed[job["id"]]
+            self._results[job["id"]] = result
+            return True
+
+    def pop_results(self, job_ids):
+        with self._lock:
+            return dict(
+                (job_id, self._results.pop(job_id))
+                for job_id in job_ids
+                if job_id in self._results
+            )
+
+    def requeue_lost(self):
+        now = time.time()
+        with self._lock:
+            lost_workers = set(
+                worker_id
+                for worker_id, last_seen in self._heartbeats.items()
+                if now - last_seen >= self.stale_after
+            )
+            for worker_id in lost_workers:
+                self._requeue_claimed(worker_id, lost=True)
+
+    def _requeue_claimed(self, worker_id, lost):
+        # Called with the lock held.
+        for job_id, (claimed_by, job) in list(self._claimed.items()):
+            if claimed_by != worker_id:
+                continue
+            del self._claimed[job_id]
+            if lost:
+                job["attempts"] += 1
+            if job["attempts"] >= job["max_attempts"]:
+                self._results[job_id] = lost_result(job)
+            else:
+                logger.info("Requeuing job %s from worker %s", job_id, worker_id)
+                self._pending.insert(0, job)
+        self._heartbeats.pop(worker_id, None)
+
+    def unregister(self, worker_id):
+        """Forget a worker, handing out the jobs it didn't complete again."""
+        with self._lock:
+            self._requeue_claimed(worker_id, lost=False)
+
+
+def is_loopback(host):
+    try:
+        address = socket.gethostbyname(host) if host else "0.0.0.0"
+    except (socket.error, UnicodeError):
+        return False
+    return address.startswith("127.")
+
+
+def get_broker_authkey(address, authkey=None):
+    """Return the authkey for a TCP broker at address as bytes.
+
+    Raises JobError for a non-loopback address if neither authkey nor
+    PSSEPATH_DAEMON_AUTHKEY is set, as the per user key can't be shared
+    between machines.
+    """
+    if authkey is None and not os.environ.get(AUTHKEY_ENV_VAR):
+        if not is_loopback(address[0]):
+            raise JobError(
+                "TCP broker at %s:%s needs an authkey, pass authkey= or set %s"
+                % (address[0], address[1], AUTHKEY_ENV_VAR)
+            )
+    return get_authkey(authkey)
+
+
+class BrokerServer(object):
+    """Serves a MemoryBroker to TcpBrokers."""
+
+    def __init__(self, address=("localhost", DEFAULT_PORT), authkey=None, broker=None):
+        self.broker = broker if broker is not None else MemoryBroker()
+        self._listener = Listener(address, authkey=get_broker_authkey(address, authkey))
+        self.address = self._listener.address
+        self._closed = False
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (IOError, OSError, EOFError):
+                if self._closed:
+                    break
+                # A client that failed to authenticate.
+                continue
+            thread = threading.Thread(target=self.serve_client, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def serve_client(self, conn):
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, IOError, OSError):
+                    break
+                try:
+                    if method not in BROKER_METHODS:
+                        raise JobError("Unknown broker method %r" % (method,))
+                    conn.send(("ok", getattr(self.broker, method)(*args, **kwargs)))
+                except Exception as exc:
+                    conn.send(error_result(exc))
+
+    def stop(self):
+        self._closed = True
+        self._listener.close()
+
+
+class TcpBroker(object):
+    """Connection to a BrokerServer, usable from several threads."""
+
+    def __init__(self, address, authkey=None):
+        self._conn = Client(address, authkey=get_broker_authkey(address, authkey))
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name not in BROKER_METHODS:
+            raise AttributeError(name)
+
+        def remote_call(*args, **kwargs):
+            with self._lock:
+                self._conn.send((name, args, kwargs))
+                status, value = self._conn.recv()
+            if status == "error":
+                raise value[0]
+            return value
+
+        return remote_call
+
+    def close(self):
+        self._conn.close()
+
+
+def parse_address(text):
+    """Return (host, port) from "host:port" or "host"."""
+    host, _, port = text.rpartition(":")
+    if not host:
+        return (port, DEFAULT_PORT)
+    return (host, int(port))
+
+
+def open_broker(spec, **kwargs):
+    """Return a TcpBroker for "tcp://host:port", otherwise a DirectoryBroker."""
+    if spec.startswith("tcp://"):
+        return TcpBroker(parse_address(spec[len("tcp://") :]), **kwargs)
+    return DirectoryBroker(spec, **kwargs)
+
+
+class JobQueue(object):
+    """Submit jobs to a broker and collect their results."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def submit(self, calls, psse_version=None, max_attempts=3):
+        """Submit a job of calls and return its id.
+
+        calls: [(fn, args, kwargs), ...] where args and kwargs may be left off.
+        psse_version: only run on workers with this PSSE version.
+        max_attempts: times the job is handed out if its worker is lost.
+        """
+        job = new_job(calls, psse_version, max_attempts)
+        self.broker.submit([job])
+        return job["id"]
+
+    def map(self, fn, items, psse_version=None, max_attempts=3):
+        """Submit a job calling fn(item) for each item. Returns the job ids."""
+        jobs = [new_job([(fn, (item,))], psse_version, max_attempts) for item in items]
+        self.broker.submit(jobs)
+        return [job["id"] for job in jobs]
+
+    def gather(self, job_ids, timeout=None, poll_interval=0.5, return_exceptions=False):
+        """Wait for the jobs and return their results in job_ids' order.
+
+        Each result is the list of the job's call results. A failed job
+        raises its exception, or with return_exceptions it is returned in
+        place of the result.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        results = {}
+        waiting = list(job_ids)
+        while waiting:
+            results.update(self.broker.pop_results(waiting))
+            waiting = [job_id for job_id in waiting if job_id not in results]
+            if not waiting:
+                break
+            if deadline is not None and time.time() >= deadline:
+                raise JobError("Timed out waiting for %i jobs" % (len(waiting),))
+            self.broker.requeue_lost()
+            time.sleep(poll_interval)
+
+        gathered = []
+        for job_id in job_ids:
+            status, value = results[job_id]
+            if status == "error":
+                exc, remote_traceback = value
+                if remote_traceback:
+                    logger.debug("Job %s failed:\n%s", job_id, remote_traceback)
+                if not return_exceptions:
+                    raise exc
+                value = exc
+            gathered.append(value)
+        return gathered
+
+
+class Worker(object):
+    """Runs jobs from a broker on this machine's PSSE.
+
+    psse_version: passed to add_pssepath(), unless PSSE is already set up.
+    psseinit_buses: run psspy.psseinit(psseinit_buses) once at start.
+    batch_size: jobs claimed at a time.
+    Stops taking jobs once a pssepath watchdog asks for a restart.
+    """
+
+    def __init__(
+        self,
+        broker,
+        psse_version=None,
+        psseinit_buses=None,
+        batch_size=4,
+        poll_interval=1.0,
+        heartbeat_interval=10.0,
+        worker_id=None,
+    ):
+        self.broker = broker
+        self.psse_version = psse_version
+        self.psseinit_buses = psseinit_buses
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = worker_id or "%s-%i-%s" % (
+            socket.gethostname(),
+            os.getpid(),
+            uuid.uuid4().hex[:8],
+        )
+        self.psspy = None
+        self.jobs_run = 0
+        self._stop = threading.Event()
+
+    def start_psse(self):
+        if not core.INITIALIZED:
+            core.add_pssepath(self.psse_version)
+        import psspy
+
+        if self.psseinit_buses:
+            psspy.psseinit(self.psseinit_buses)
+        self.psspy = psspy
+        self.psse_version = core.PSSE_VERSION
+
+    def run_job(self, job):
+        try:
+            return ("ok", run_calls(self.psspy, job["calls"]))
+        except Exception as exc:
+            return error_result(exc)
+
+    def complete(self, job, result):
+        try:
+            self.broker.complete(self.worker_id, job, result)
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            # The result can't be sent, send why instead of stopping the worker.
+            logger.warning("Could not send the result of job %s: %r", job["id"], exc)
+            self.broker.complete(
+                self.worker_id,
+                job,
+                error_result(JobError("Job %s result can't be pickled: %r" % (job["id"], exc))),
+            )
+
+    def send_heartbeats(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.broker.heartbeat(self.worker_id)
+            except Exception:
+                logger.warning("Heartbeat to the broker failed", exc_info=True)
+
+    def restart_needed(self):
+        from .watchdog import get_watchdog
+
+        watchdog = get_watchdog()
+        return watchdog is not None and watchdog.restart_needed.is_set()
+
+    def run(self, stop_when_idle=False):
+        """Run jobs until stop(), or until there are none if stop_when_idle."""
+        if self.psspy is None:
+            self.start_psse()
+        self._stop.clear()
+        heartbeats = threading.Thread(target=self.send_heartbeats)
+        heartbeats.daemon = True
+        heartbeats.start()
+        try:
+            while not self._stop.is_set() and not self.restart_needed():
+                self.broker.requeue_lost()
+                jobs = self.broker.claim(self.worker_id, self.psse_version, self.batch_size)
+                if not jobs:
+                    if stop_when_idle:
+                        break
+                    self._stop.wait(self.poll_interval)
+                    continue
+                for job in jobs:
+                    self.complete(job, self.run_job(job))
+                    self.jobs_run += 1
+        finally:
+            self._stop.set()
+            heartbeats.join()
+            self.broker.unregister(self.worker_id)
+
+    def stop(self):
+        self._stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a pssepath job broker or worker.")
+    commands = parser.add_subparsers(dest="command")
+
+    serve = commands.add_parser("serve", help="run a broker for tcp:// workers and clients")
+    serve.add_argument("--address", default="localhost:%i" % (DEFAULT_PORT,))
+
+    work = commands.add_parser("work", help="run jobs on this machine's PSSE")
+    work.add_argument("broker", help="a shared directory or tcp://host:port")
+    work.add_argument("--psse-version", type=parse_psse_version, default=None)
+    work.add_argument("--buses", type=int, default=None, help="run psspy.psseinit(BUSES)")
+    work.add_argument("--batch-size", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = BrokerServer(parse_address(args.address))
+        logger.info("Broker listening on %s:%s", *server.address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+    elif args.command == "work":
+        worker = Worker(
+            open_broker(args.broker),
+            psse_version=args.psse_version,
+            psseinit_buses=args.buses,
+            batch_size=args.batch_size,
+        )
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    main()
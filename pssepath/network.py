@@ -0,0 +1,397 @@
+"""Bulk network data from psspy as NumPy structured arrays.
+
+Fetching bus, branch, machine and load data one element at a time is slow
+on big cases. NetworkData uses psspy's array functions (abusint,
+abrnreal, amachchar, aloadcplx, ...) to fetch whole columns with one call
+per data type:
+
+    import pssepath
+    pssepath.add_pssepath()
+
+    from pssepath.network import NetworkData
+
+    data = NetworkData()
+    buses = data.get("bus", ["NUMBER", "PU", "ANGLED", "NAME"])
+    heavy = buses[buses["PU"] > 1.05]["NUMBER"]
+
+Results are cached until the case changes. Creating a NetworkData wraps the
+psspy functions that load, modify or solve a case so they invalidate every
+cache. Call invalidate_all() after changing the case by other means.
+
+Requires NumPy.
+"""
+import re
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .core import PsspyError
+from .instrument import InstrumentedPsspy
+
+
+# psspy array function suffix and structured array dtype for each data type.
+KIND_DTYPES = {
+    "int": "i4",
+    "real": "f8",
+    "cplx": "c16",
+    "char": "U40",
+}
+
+
+def bus_args(sid, flag):
+    return (sid, flag)
+
+
+def branch_args(sid, flag):
+    # owner=1 (use bus ownership), ties=1 (only branches inside the subsystem)
+    # and entry=1 (one entry per branch).
+    return (sid, 1, 1, flag, 1)
+
+
+ElementType = namedtuple(
+    "ElementType", ["prefix", "call_args", "default_flag", "fields", "default_fields"]
+)
+
+ELEMENTS = {
+    "bus": ElementType(
+        prefix="abus",
+        call_args=bus_args,
+        # 2 = all buses
+        default_flag=2,
+        fields={
+            "NUMBER": "int",
+            "TYPE": "int",
+            "AREA": "int",
+            "ZONE": "int",
+            "OWNER": "int",
+            "DUMMY": "int",
+            "BASE": "real",
+            "PU": "real",
+            "KV": "real",
+            "ANGLE": "real",
+            "ANGLED": "real",
+            "NVLMHI": "real",
+            "NVLMLO": "real",
+            "EVLMHI": "real",
+            "EVLMLO": "real",
+            "MISMATCH": "real",
+            "VOLTAGE": "cplx",
+            "SHUNTACT": "cplx",
+            "NAME": "char",
+            "EXNAME": "char",
+        },
+        default_fields=("NUMBER", "TYPE", "AREA", "ZONE", "BASE", "PU", "ANGLED", "NAME"),
+    ),
+    "branch": ElementType(
+        prefix="abrn",
+        call_args=branch_args,
+        # 4 = all non-transformer branches and two-winding transformers
+        default_flag=4,
+        fields=dict(
+            [
+                ("FROMNUMBER", "int"),
+                ("TONUMBER", "int"),
+                ("STATUS", "int"),
+                ("METERNUMBER", "int"),
+                ("NMETERNUMBER", "int"),
+                ("OWNERS", "int"),
+                ("RATEA", "real"),
+                ("RATEB", "real"),
+                ("RATEC", "real"),
+                ("LENGTH", "real"),
+                ("CHARGING", "real"),
+                ("P", "real"),
+                ("Q", "real"),
+                ("MVA", "real"),
+                ("AMPS", "real"),
+                ("PLOSS", "real"),
+                ("QLOSS", "real"),
+                ("PCTRATE", "real"),
+                ("PCTRATEA", "real"),
+                ("PCTRATEB", "real"),
+                ("PCTRATEC", "real"),
+                ("RX", "cplx"),
+                ("PQ", "cplx"),
+                ("FROMEXNAME", "char"),
+                ("TOEXNAME", "char"),
+                ("FROMNAME", "char"),
+                ("TONAME", "char"),
+                ("ID", "char"),
+            ]
+            # PSSE 35 has 12 rating sets.
+            + [("RATE%i" % (rate,), "real") for rate in range(1, 13)]
+            + [("PCTRATE%i" % (rate,), "real") for rate in range(1, 13)]
+        ),
+        default_fields=("FROMNUMBER", "TONUMBER", "ID", "STATUS", "RX", "P", "Q"),
+    ),
+    "winding": ElementType(
+        prefix="awnd",
+        call_args=branch_args,
+        # 2 = every winding of all three-winding transformers
+        default_flag=2,
+        fields=dict(
+            [
+                ("WIND1NUMBER", "int"),
+                ("WIND2NUMBER", "int"),
+                ("WIND3NUMBER", "int"),
+                ("WNDNUM", "int"),
+                ("STATUS", "int"),
+                ("NMETERNUMBER", "int"),
+                ("OWNERS", "int"),
+                ("RATEA", "real"),
+                ("RATEB", "real"),
+                ("RATEC", "real"),
+                ("RATIO", "real"),
+                ("ANGLE", "real"),
+                ("P", "real"),
+                ("Q", "real"),
+                ("MVA", "real"),
+                ("AMPS", "real"),
+                ("RX", "cplx"),
+                ("PQ", "cplx"),
+                ("ID", "char"),
+                ("XFRNAME", "char"),
+            ]
+            + [("RATE%i" % (rate,), "real") for rate in range(1, 13)]
+        ),
+        default_fields=(
+            "WIND1NUMBER",
+            "WIND2NUMBER",
+            "WIND3NUMBER",
+            "ID",
+            "WNDNUM",
+            "STATUS",
+            "RX",
+            "P",
+            "Q",
+        ),
+    ),
+    "machine": ElementType(
+        prefix="amach",
+        call_args=bus_args,
+        # 4 = all machines
+        default_flag=4,
+        fields={
+            "NUMBER": "int",
+            "STATUS": "int",
+            "OWNERS": "int",
+            "WMOD": "int",
+            "PGEN": "real",
+            "QGEN": "real",
+            "MVA": "real",
+            "MBASE": "real",
+            "PMAX": "real",
+            "PMIN": "real",
+            "QMAX": "real",
+            "QMIN": "real",
+            "PQGEN": "cplx",
+            "ZSORCE": "cplx",
+            "ID": "char",
+            "NAME": "char",
+            "EXNAME": "char",
+        },
+        default_fields=("NUMBER", "ID", "STATUS", "PGEN", "QGEN", "PMAX", "PMIN"),
+    ),
+    "load": ElementType(
+        prefix="aload",
+        call_args=bus_args,
+        # 4 = all loads
+        default_flag=4,
+        fields={
+            "NUMBER": "int",
+            "STATUS": "int",
+            "AREA": "int",
+            "ZONE": "int",
+            "OWNER": "int",
+            "SCALE": "int",
+            "MVAACT": "cplx",
+            "MVANOM": "cplx",
+            "ILACT": "cplx",
+            "ILNOM": "cplx",
+            "YLACT": "cplx",
+            "YLNOM": "cplx",
+            "TOTALACT": "cplx",
+            "TOTALNOM": "cplx",
+            "ID": "char",
+            "NAME": "char",
+            "EXNAME": "char",
+        },
+        default_fields=("NUMBER", "ID", "STATUS", "MVAACT"),
+    ),
+}
+
+# psspy functions that load, change or solve a case.
+CASE_CHANGE_RE = re.compile(
+    r"(_chng|_data|_purg|^purg|^case$|^read|^rawd|^dyre|^getcontingency|^fnsl$|^fdns$"
+    r"|^nsol$|^solv$|^mslv$|^inlf$|^dist_|^movebus|^splt|^join|^bsys|^ltap|^recn|^newcase)"
+)
+
+_case_generation = 0
+_tracked_modules = set()
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("pssepath.network requires NumPy: pip install numpy")
+
+
+def invalidate_all():
+    """Mark every NetworkData cache as out of date."""
+    global _case_generation
+    _case_generation += 1
+
+
+def track_case_changes(psspy):
+    """Wrap the psspy functions matching CASE_CHANGE_RE to call invalidate_all().
+
+    An InstrumentedPsspy proxy is unwrapped so the module itself is patched,
+    and the proxy then wraps the patched functions.
+    """
+    proxy = None
+    if isinstance(psspy, InstrumentedPsspy):
+        proxy, psspy = psspy, psspy.wrapped
+    if id(psspy) not in _tracked_modules:
+        for name in dir(psspy):
+            fn = getattr(psspy, name)
+            if name.startswith("_") or not callable(fn) or not CASE_CHANGE_RE.search(name):
+                continue
+            setattr(psspy, name, invalidating(fn))
+        _tracked_modules.add(id(psspy))
+    if proxy is not None:
+        proxy.forget_wrappers(
+            [name for name in dir(psspy) if CASE_CHANGE_RE.search(name)]
+        )
+
+
+def invalidating(fn):
+    def wrapped(*args, **kwargs):
+        invalidate_all()
+        return fn(*args, **kwargs)
+
+    wrapped.__name__ = fn.__name__
+    wrapped.__doc__ = fn.__doc__
+    return wrapped
+
+
+def field_kinds(element_type, fields):
+    """Return [(name, kind)] for names or (name, kind) pairs in fields."""
+    kinds = []
+    for field in fields:
+        if isinstance(field, tuple):
+            kinds.append(field)
+        else:
+            try:
+                kinds.append((field, element_type.fields[field]))
+            except KeyError:
+                raise ValueError(
+                    "Unknown field %r, pass it as a (name, kind) pair where kind is "
+                    "one of %s" % (field, ", ".join(sorted(KIND_DTYPES)))
+                )
+    return kinds
+
+
+def fetch(psspy, element, fields=None, sid=-1, flag=None):
+    """Fetch fields of every element in subsystem sid as a structured array.
+
+    Makes one psspy call per data type (int, real, cplx, char) in fields.
+    """
+    require_numpy()
+    element_type = ELEMENTS[element]
+    if fields is None:
+        fields = element_type.default_fields
+    if flag is None:
+        flag = element_type.default_flag
+    kinds = field_kinds(element_type, fields)
+    call_args = element_type.call_args(sid, flag)
+
+    columns = {}
+    for kind in KIND_DTYPES:
+        names = [name for name, field_kind in kinds if field_kind == kind]
+        if not names:
+            continue
+        fn_name = element_type.prefix + kind
+        ierr, values = getattr(psspy, fn_name)(*(call_args + (names,)))
+        if ierr:
+            raise PsspyError(
+                "psspy.%s(%s) returned ierr=%s" % (fn_name, ", ".join(names), ierr),
+                ierr,
+            )
+        for name, column in zip(names, values):
+            columns[name] = column
+
+    length = len(columns[kinds[0][0]]) if kinds else 0
+    data = np.empty(length, dtype=[(name, KIND_DTYPES[kind]) for name, kind in kinds])
+    for name, kind in kinds:
+        if kind == "char":
+            data[name] = [value.strip() for value in columns[name]]
+        else:
+            data[name] = columns[name]
+    return data
+
+
+class NetworkData(object):
+    """Cached bulk access to the network data of the case in psspy."""
+
+    def __init__(self, psspy=None, sid=-1, track_changes=True):
+        require_numpy()
+        if psspy is None:
+            import psspy
+        self.psspy = psspy
+        self.sid = sid
+        self._cache = {}
+        self._generation = None
+        self._case_file = None
+        if track_changes:
+            track_case_changes(psspy)
+
+    def case_file(self):
+        try:
+            return self.psspy.sfiles()[0]
+        except Exception:
+            return None
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def check_cache(self):
+        """Drop the cache if the case was changed or a different case loaded."""
+        case_file = self.case_file()
+        if self._generation != _case_generation or self._case_file != case_file:
+            self._cache.clear()
+            self._generation = _case_generation
+            self._case_file = case_file
+
+    def get(self, element, fields=None, flag=None):
+        """Return a structured array of fields for every element, see fetch()."""
+        self.check_cache()
+        if fields is not None:
+            fields = tuple(fields)
+        key = (element, fields, flag)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        data = fetch(self.psspy, element, fields, self.sid, flag)
+        # Cached arrays are shared, don't let callers change them by accident.
+        data.flags.writeable = False
+        self._cache[key] = data
+        return data
+
+    def buses(self, fields=None, flag=None):
+        return self.get("bus", fields, flag)
+
+    def branches(self, fields=None, flag=None):
+        return self.get("branch", fields, flag)
+
+    def windings(self, fields=None, flag=None):
+        """Three-winding transformer windings, one row per winding."""
+        return self.get("winding", fields, flag)
+
+    def machines(self, fields=None, flag=None):
+        return self.get("machine", fields, flag)
+
+    def loads(self, fields=None, flag=None):
+        return self.get("load", fields, flag)
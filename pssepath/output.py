@@ -0,0 +1,345 @@
+"""Capture psspy progress, report, alert and prompt output.
+
+Writing PSSE's text output to the terminal costs real time on big runs.
+An OutputCapture routes each output channel to a file written by PSSE itself
+and hands the text back per job:
+
+    import pssepath
+    capture = pssepath.add_pssepath(capture_output=True)  # or an OutputCapture
+
+    import psspy
+    psspy.psseinit(50000)  # output routing is applied here, or straight away
+                           # if psseinit() had already run
+
+    with capture.job() as job:
+        psspy.case(r"c:\\cases\\base.sav")
+        psspy.fnsl()
+    print(job.text("report"))
+
+With sink="memory" (the default) each job's output is read back into a
+bounded ring buffer per channel and the spool files are reused. With
+sink="file" every job keeps its own files in 'directory' and text is only
+read when asked for, while output between jobs is cut down to its last
+max_bytes.
+
+PSSE writes the spool files itself, so they can only be swapped or cut down
+between psspy calls. Jobs do this as they start and end. Code producing a
+lot of output outside job() blocks should call capture.trim() now and then
+to keep the files within max_bytes.
+
+Channels below 'level' are not written at all. The order is progress,
+report, alert, prompt, so level="alert" drops progress and report output.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+
+
+CHANNELS = ("progress", "report", "alert", "prompt")
+
+# psspy *_output islct values.
+OUTPUT_TO_TERMINAL = 1
+OUTPUT_TO_FILE = 2
+NO_OUTPUT = 6
+
+# psspy *_output options[0].
+OVERWRITE = 0
+APPEND = 1
+
+
+class OutputCaptureError(Exception):
+    pass
+
+
+def psse_initialized(psspy):
+    """True if psspy.psseinit() has already run in this process."""
+    # Not every psspy release has psseinitialized().
+    check = getattr(psspy, "psseinitialized", None)
+    if check is None:
+        return False
+    try:
+        return bool(check())
+    except Exception:
+        return False
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def cut_to_tail(path, max_bytes):
+    """Keep only the last max_bytes of a file PSSE doesn't have open."""
+    if file_size(path) <= max_bytes:
+        return
+    with open(path, "rb") as spool:
+        spool.seek(-max_bytes, os.SEEK_END)
+        data = spool.read()
+    with open(path, "wb") as spool:
+        spool.write(data)
+
+
+def read_tail(path, max_bytes):
+    """Return up to the last max_bytes of a file as text."""
+    try:
+        with open(path, "rb") as spool:
+            spool.seek(0, os.SEEK_END)
+            size = spool.tell()
+            spool.seek(max(0, size - max_bytes))
+            data = spool.read()
+    except (IOError, OSError):
+        return ""
+    return data.decode("latin-1")
+
+
+class RingBuffer(object):
+    """Keeps the most recent max_bytes of text appended to it."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._chunks = deque()
+        self._size = 0
+
+    def append(self, text):
+        if not text:
+            return
+        if len(text) > self.max_bytes:
+            text = text[-self.max_bytes :]
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.max_bytes:
+            excess = self._size - self.max_bytes
+            oldest = self._chunks[0]
+            if len(oldest) <= excess:
+                self._chunks.popleft()
+                self._size -= len(oldest)
+            else:
+                self._chunks[0] = oldest[excess:]
+                self._size -= excess
+
+    def text(self):
+        return "".join(self._chunks)
+
+    def clear(self):
+        self._chunks.clear()
+        self._size = 0
+
+
+class JobOutput(object):
+    """The output of one OutputCapture.job() block."""
+
+    def __init__(self, texts=None, paths=None):
+        self._texts = texts or {}
+        self.paths = paths or {}
+
+    def text(self, channel=None):
+        """Return a channel's text, or every channel's text joined in order."""
+        if channel is None:
+            return "".join(self.text(name) for name in CHANNELS)
+        if channel in self._texts:
+            return self._texts[channel]
+        if channel in self.paths:
+            return read_tail(self.paths[channel], os.path.getsize(self.paths[channel]))
+        return ""
+
+
+class OutputCapture(object):
+    """Route psspy text output to files and collect it per job.
+
+    level: the least important channel to keep, see CHANNELS.
+    sink: "memory" to read output into ring buffers of max_bytes per
+        channel, or "file" to keep per job files in directory. Output
+        between jobs is also kept to max_bytes per channel.
+    directory: where the files go, a new temp dir if not given.
+    """
+
+    def __init__(self, level="progress", sink="memory", max_bytes=1 << 20, directory=None):
+        if level not in CHANNELS:
+            raise ValueError("level must be one of %s, not %r" % (CHANNELS, level))
+        if sink not in ("memory", "file"):
+            raise ValueError('sink must be "memory" or "file", not %r' % (sink,))
+        self.channels = CHANNELS[CHANNELS.index(level) :]
+        self.sink = sink
+        self.max_bytes = max_bytes
+        self.own_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="pssepath-output-")
+        elif not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.rings = dict((channel, RingBuffer(max_bytes)) for channel in self.channels)
+        self.psspy = None
+        # True once apply() has routed the output.
+        self.applied = False
+        self._spool_index = 0
+        self._job_count = 0
+        self._current_paths = {}
+        # {channel: RingBuffer} of the running job with sink="memory".
+        self._job_rings = None
+
+    def install(self):
+        """Apply the routing now if psspy is initialised and whenever psspy.psseinit() runs.
+
+        psspy needs to be initialised before its output can be redirected.
+        If psspy can't tell whether it is, call apply() after psseinit().
+        """
+        import psspy
+
+        self.psspy = psspy
+        if not self.applied and psse_initialized(psspy):
+            self.apply()
+        if getattr(psspy.psseinit, "pssepath_capture", None) is self:
+            return
+        psseinit = psspy.psseinit
+
+        def capturing_psseinit(*args, **kwargs):
+            result = psseinit(*args, **kwargs)
+            self.apply()
+            return result
+
+        capturing_psseinit.pssepath_capture = self
+        capturing_psseinit.__doc__ = psseinit.__doc__
+        psspy.psseinit = capturing_psseinit
+
+    def route(self, paths, mode=OVERWRITE, others=NO_OUTPUT):
+        """Send the kept channels to paths and the others to 'others'."""
+        psspy = self.psspy
+        for channel in CHANNELS:
+            set_output = getattr(psspy, channel + "_output")
+            if channel in paths:
+                set_output(OUTPUT_TO_FILE, paths[channel], [mode, 0])
+            else:
+                set_output(others, "", [0, 0])
+        self._current_paths = paths
+
+    def spool_paths(self, name):
+        return dict(
+            (channel, os.path.join(self.directory, "%s-%s.txt" % (name, channel)))
+            for channel in self.channels
+        )
+
+    def apply(self):
+        """Start capturing. Called after psspy.psseinit() by install()."""
+        if self.psspy is None:
+            import psspy
+
+            self.psspy = psspy
+        self.applied = True
+        if self.sink == "memory":
+            self.route(self.spool_paths("spool%i" % (self._spool_index,)))
+            return
+        between_paths = self.spool_paths("between-jobs")
+        if self._current_paths == between_paths:
+            # PSSE has to close the files before they can be cut down.
+            self.route({})
+        for path in between_paths.values():
+            cut_to_tail(path, self.max_bytes)
+        self.route(between_paths, APPEND)
+
+    def trim(self):
+        """Swap or cut down spool files that have grown past max_bytes.
+
+        Only output between jobs is trimmed with sink="file".
+        """
+        if not any(file_size(path) > self.max_bytes for path in self._current_paths.values()):
+            return
+        if self.sink == "memory":
+            self.collect()
+        elif self._current_paths == self.spool_paths("between-jobs"):
+            self.apply()
+
+    def collect(self):
+        """Switch to fresh spool files and return {channel: text} written since the last switch.
+
+        Switching makes PSSE close, and so flush, the files being read.
+        """
+        if self.sink == "memory":
+            old_paths = self._current_paths
+            self._spool_index = 1 - self._spool_index
+            self.route(self.spool_paths("spool%i" % (self._spool_index,)))
+            texts = {}
+            for channel, path in old_paths.items():
+                texts[channel] = read_tail(path, self.max_bytes)
+                self.rings[channel].append(texts[channel])
+                if self._job_rings is not None:
+                    self._job_rings[channel].append(texts[channel])
+            return texts
+        self.apply()
+        return {}
+
+    @contextmanager
+    def job(self):
+        """Collect the output written inside the 'with' block into a JobOutput."""
+        if not self.applied:
+            raise OutputCaptureError(
+                "Output isn't captured until psspy.psseinit() has run, call "
+                "psspy.psseinit() (or apply() if it already ran) before job()."
+            )
+        job_output = JobOutput()
+        self.collect()
+        if self.sink == "file":
+            self._job_count += 1
+            job_output.paths = self.spool_paths("job%04i" % (self._job_count,))
+            self.route(job_output.paths)
+        else:
+            # Also gathers output collected by trim() during the job.
+            self._job_rings = dict(
+                (channel, RingBuffer(self.max_bytes)) for channel in self.channels
+            )
+        try:
+            yield job_output
+        finally:
+            self.collect()
+            if self.sink == "memory":
+                job_output._texts = dict(
+                    (channel, ring.text()) for channel, ring in self._job_rings.items()
+                )
+                self._job_rings = None
+
+    def text(self, channel=None):
+        """Return the recent output kept in the ring buffers (sink="memory")."""
+        if channel is None:
+            return "".join(self.rings[name].text() for name in self.channels)
+        return self.rings[channel].text()
+
+    def close(self):
+        """Send output back to the terminal and remove the temp dir this capture created."""
+        if self.psspy is not None and self._current_paths:
+            self.route({}, others=OUTPUT_TO_TERMINAL)
+        self.applied = False
+        if self.own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_capture = None
+
+
+def install_output_capture(capture_output):
+    """Set up capture_output (True or an OutputCapture) for add_pssepath()."""
+    global _capture
+
+    if capture_output is True:
+        capture_output = OutputCapture()
+    capture_output.install()
+    if _capture is None:
+        atexit.register(close_output_capture)
+    _capture = capture_output
+    return capture_output
+
+
+def get_output_capture():
+    """Return the OutputCapture set up by add_pssepath() or None."""
+    return _capture
+
+
+def close_output_capture():
+    global _capture
+
+    if _capture is not None:
+        _capture.close()
+        _capture = None
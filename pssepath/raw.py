@@ -0,0 +1,482 @@
+"""Parse PSS/E RAW case files (versions 33 to 35) without PSSE.
+
+    from pssepath.raw import read_raw
+
+    case = read_raw(r"c:\\cases\\base.raw", workers=4)
+    buses = case["bus"]
+    print(case.version, len(buses["I"]), buses["VM"].mean())
+
+The file is read line by line and cut into chunks of whole records at the
+data section boundaries. Chunks are parsed on 'workers' processes into
+columns, so only the chunks in flight and the parsed columns are held in
+memory, never the whole file. (On Windows, call read_raw() under
+'if __name__ == "__main__":' when workers > 1.)
+
+Each section is a dict of {column name: NumPy array}. Sections with a known
+layout (see SECTION_FIELDS) get PSSE's column names and types. Missing
+trailing values are filled with NaN, 0 or "". Other sections are returned
+as text columns C0, C1, ... with one row per line.
+
+In v35 files each substation record is followed by its nodes, switching
+devices and terminals. These are returned as the substation_node,
+substation_switching_device and substation_terminal sections, with the
+number of their substation in an IS column before the text columns.
+
+Requires NumPy.
+"""
+import os
+import re
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+
+class RawParseError(Exception):
+    pass
+
+
+SECTIONS_33 = (
+    "bus",
+    "load",
+    "fixed_shunt",
+    "generator",
+    "branch",
+    "transformer",
+    "area",
+    "two_terminal_dc",
+    "vsc_dc",
+    "impedance_correction",
+    "multi_terminal_dc",
+    "multi_section_line",
+    "zone",
+    "interarea_transfer",
+    "owner",
+    "facts",
+    "switched_shunt",
+    "gne",
+    "induction_machine",
+)
+SECTIONS_34 = SECTIONS_33[:5] + ("system_switching_device",) + SECTIONS_33[5:]
+SECTIONS_35 = ("system_wide",) + SECTIONS_34 + ("substation",)
+
+# Sub-sections following each v35 substation record, each ending with its
+# own '0 / END OF ...' line.
+SUBSTATION_PARTS = (
+    "substation_node",
+    "substation_switching_device",
+    "substation_terminal",
+)
+
+# Record lengths of the multi line records, other than transformers.
+RECORD_LINES = {
+    "two_terminal_dc": 3,
+    "vsc_dc": 3,
+}
+
+Field = namedtuple("Field", ["name", "kind"])
+
+
+def fields(spec):
+    """Return Fields from 'NAME:kind NAME ...' where kind is i, f or s (f if omitted)."""
+    parsed = []
+    for item in spec.split():
+        name, _, kind = item.partition(":")
+        parsed.append(Field(name, kind or "f"))
+    return tuple(parsed)
+
+
+OWNERSHIP = "O1:i F1 O2:i F2 O3:i F3 O4:i F4"
+RATES_12 = " ".join("RATE%i" % (rate,) for rate in range(1, 13))
+
+# {section: {version: fields}}, using the newest version <= the file's.
+SECTION_FIELDS = {
+    "bus": {
+        33: fields("I:i NAME:s BASKV IDE:i AREA:i ZONE:i OWNER:i VM VA NVHI NVLO EVHI EVLO"),
+    },
+    "load": {
+        33: fields(
+            "I:i ID:s STATUS:i AREA:i ZONE:i PL QL IP IQ YP YQ OWNER:i SCALE:i INTRPT:i"
+        ),
+        35: fields(
+            "I:i ID:s STATUS:i AREA:i ZONE:i PL QL IP IQ YP YQ OWNER:i SCALE:i "
+            "INTRPT:i DGENP DGENQ DGENM:i LOADTYPE:s"
+        ),
+    },
+    "fixed_shunt": {
+        33: fields("I:i ID:s STATUS:i GL BL"),
+    },
+    "generator": {
+        33: fields(
+            "I:i ID:s PG QG QT QB VS IREG:i MBASE ZR ZX RT XT GTAP STAT:i RMPCT PT PB "
+            + OWNERSHIP
+            + " WMOD:i WPF"
+        ),
+        35: fields(
+            "I:i ID:s PG QG QT QB VS IREG:i NREG:i MBASE ZR ZX RT XT GTAP STAT:i "
+            "RMPCT PT PB BASLOD:i " + OWNERSHIP + " WMOD:i WPF"
+        ),
+    },
+    "branch": {
+        33: fields(
+            "I:i J:i CKT:s R X B RATEA RATEB RATEC GI BI GJ BJ ST:i MET:i LEN "
+            + OWNERSHIP
+        ),
+        34: fields(
+            "I:i J:i CKT:s R X B NAME:s " + RATES_12 + " GI BI GJ BJ ST:i MET:i LEN "
+            + OWNERSHIP
+        ),
+    },
+    "area": {
+        33: fields("I:i ISW:i PDES PTOL ARNAME:s"),
+    },
+    "zone": {
+        33: fields("I:i ZONAME:s"),
+    },
+    "owner": {
+        33: fields("I:i OWNAME:s"),
+    },
+    "interarea_transfer": {
+        33: fields("ARFROM:i ARTO:i TRID:s PTRAN"),
+    },
+}
+
+# Transformer columns taken from fixed positions on each line of a record:
+# [(line index, fields)]. Only the leading values whose position is the same
+# for two and three winding transformers in every version are used.
+TRANSFORMER_FIELDS = (
+    (0, fields("I:i J:i K:i CKT:s CW:i CZ:i CM:i MAG1 MAG2 NMETR:i NAME:s STAT:i")),
+    (1, fields("R1_2 X1_2 SBASE1_2")),
+    (2, fields("WINDV1 NOMV1 ANG1")),
+    (3, fields("WINDV2 NOMV2")),
+)
+
+TOKEN_RE = re.compile(r"'[^']*'|\"[^\"]*\"|[^,\s'\"/]+|,|/")
+
+
+def split_record(line):
+    """Split a RAW data line into its values, dropping any '/' comment.
+
+    Values are separated by commas and/or blanks, and nothing between two
+    commas is an empty value.
+    """
+    values = []
+    expecting_value = True
+    for token in TOKEN_RE.findall(line):
+        if token == "/":
+            break
+        if token == ",":
+            if expecting_value:
+                values.append("")
+            expecting_value = True
+        else:
+            if token[0] in "'\"":
+                token = token[1:-1].strip()
+            values.append(token)
+            expecting_value = False
+    return values
+
+
+def is_section_end(line):
+    """True for the '0 / END OF ... DATA' line ending a section (or 'Q')."""
+    # Cheap test first, this runs on every line in the reading process.
+    if line.lstrip(" ,'\"")[:1] not in ("0", "Q", "q"):
+        return False
+    values = split_record(line)
+    return bool(values) and values[0] in ("0", "Q", "q")
+
+
+def get_section_fields(section, version):
+    versions = SECTION_FIELDS.get(section)
+    if not versions:
+        return None
+    usable = [ver for ver in versions if ver <= version]
+    return versions[max(usable) if usable else min(versions)]
+
+
+MISSING = {"i": "0", "f": "nan"}
+
+
+def make_column(values, kind):
+    """Return a NumPy array of kind from a list of value strings."""
+    if kind == "s":
+        return np.array(values, dtype=str)
+    missing = MISSING[kind]
+    column = np.array([value or missing for value in values], dtype=str)
+    if kind == "f":
+        return column.astype(np.float64)
+    try:
+        return column.astype(np.int64)
+    except ValueError:
+        # eg. "1.0"
+        return column.astype(np.float64).astype(np.int64)
+
+
+def make_columns(field_list, rows):
+    """Return {name: array} from rows of values in field_list order."""
+    columns = {}
+    for index, (name, kind) in enumerate(field_list):
+        values = [row[index] if index < len(row) else "" for row in rows]
+        columns[name] = make_column(values, kind)
+    return columns
+
+
+def split_multiline_record(record):
+    values = []
+    for line in record.split("\n"):
+        values.extend(split_record(line))
+    return values
+
+
+def parse_chunk(section, version, records):
+    """Parse a list of records into {column: array}.
+
+    A record is a line of text, with its lines joined by newlines for the
+    sections that use more than one line per record.
+    """
+    if section == "transformer":
+        split_records = [
+            [split_record(line) for line in record.split("\n")] for record in records
+        ]
+        columns = {}
+        for line_index, field_list in TRANSFORMER_FIELDS:
+            rows = [
+                record[line_index] if line_index < len(record) else []
+                for record in split_records
+            ]
+            columns.update(make_columns(field_list, rows))
+        return columns
+
+    if section in RECORD_LINES:
+        rows = [split_multiline_record(record) for record in records]
+    else:
+        rows = [split_record(record) for record in records]
+    field_list = get_section_fields(section, version)
+    if section in SUBSTATION_PARTS:
+        # Rows start with the substation number added by read_raw().
+        width = max([len(row) for row in rows] or [1])
+        field_list = [Field("IS", "i")] + [
+            Field("C%i" % (index,), "s") for index in range(width - 1)
+        ]
+    elif field_list is None:
+        width = max([len(row) for row in rows] or [0])
+        field_list = [Field("C%i" % (index,), "s") for index in range(width)]
+    return make_columns(field_list, rows)
+
+
+def concat_columns(chunks):
+    """Join the columns parsed from each chunk of a section.
+
+    Text sections can have more columns in some chunks, the rows of the
+    chunks without them get "".
+    """
+    names = []
+    for chunk in chunks:
+        for name in chunk:
+            if name not in names:
+                names.append(name)
+    columns = {}
+    for name in names:
+        parts = []
+        for chunk in chunks:
+            if name in chunk:
+                parts.append(chunk[name])
+            elif chunk:
+                length = len(next(iter(chunk.values())))
+                parts.append(np.full(length, "", dtype=str))
+        columns[name] = np.concatenate(parts) if len(parts) > 1 else parts[0]
+    return columns
+
+
+class RawCase(object):
+    """A parsed RAW file: header values, titles and {section: {column: array}}."""
+
+    def __init__(self, version, header, titles, sections):
+        self.version = version
+        self.header = header
+        self.titles = titles
+        self.sections = sections
+
+    def __getitem__(self, section):
+        return self.sections[section]
+
+    def __contains__(self, section):
+        return section in self.sections
+
+
+class SerialExecutor(object):
+    """Stand-in for ProcessPoolExecutor when workers == 1."""
+
+    class Done(object):
+        def __init__(self, value):
+            self.value = value
+
+        def result(self):
+            return self.value
+
+    def submit(self, fn, *args):
+        return self.Done(fn(*args))
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def get_record_lines(section, first_line):
+    """Return the number of lines in the record starting with first_line."""
+    if section == "transformer":
+        # Three winding transformers (K != 0) have 5 lines.
+        k_value = (split_record(first_line)[2:3] or ["0"])[0]
+        return 4 if k_value in ("", "0") else 5
+    return RECORD_LINES.get(section, 1)
+
+
+def read_header(raw_file):
+    """Return (version, header dict, titles) from the first 3 lines of a RAW file.
+
+    The title lines may be blank, so these are read before any filtering.
+    """
+    line = next(raw_file, "")
+    while line.startswith("@!"):
+        line = next(raw_file, "")
+    values = split_record(line)
+    names = ("IC", "SBASE", "REV", "XFRRAT", "NXFRAT", "BASFRQ")
+    header = {}
+    for name, value in zip(names, values):
+        if value:
+            header[name] = float(value) if name in ("SBASE", "BASFRQ") else int(float(value))
+    titles = [next(raw_file, "").rstrip("\r\n"), next(raw_file, "").rstrip("\r\n")]
+    return header.get("REV", 33), header, titles
+
+
+def iter_data_lines(raw_file):
+    for line in raw_file:
+        # v35 files describe each section's columns in '@!' comment lines.
+        if line.startswith("@!") or not line.strip():
+            continue
+        yield line.rstrip("\r\n")
+
+
+def read_raw(path, version=None, workers=None, chunk_records=20000, max_pending=None):
+    """Parse the RAW file at path into a RawCase.
+
+    version: the RAW version, otherwise taken from the file header.
+    workers: parsing processes, os.cpu_count() by default.
+    chunk_records: records handed to a worker at once.
+    max_pending: chunks in flight before waiting for results, which bounds
+        the raw text held in memory (2 per worker by default).
+    """
+    if np is None:
+        raise ImportError("pssepath.raw requires NumPy: pip install numpy")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+    if workers > 1 and ProcessPoolExecutor is not None:
+        executor = ProcessPoolExecutor(workers)
+    else:
+        executor = SerialExecutor()
+
+    pending = []
+    chunks = {}
+
+    def collect(limit):
+        while len(pending) > limit:
+            section, future = pending.pop(0)
+            chunks.setdefault(section, []).append(future.result())
+
+    def submit(section, records):
+        if records:
+            pending.append((section, executor.submit(parse_chunk, section, version, records)))
+            collect(max_pending)
+
+    try:
+        with open(path, "r", encoding="latin-1") as raw_file:
+            file_version, header, titles = read_header(raw_file)
+            lines = iter_data_lines(raw_file)
+            if version is None:
+                version = file_version
+            if version < 34:
+                section_order = SECTIONS_33
+            elif version < 35:
+                section_order = SECTIONS_34
+            else:
+                section_order = SECTIONS_35
+
+            section_index = 0
+            section = section_order[section_index]
+            records = []
+            record = []
+            record_lines = 1
+            # Index in SUBSTATION_PARTS while reading a substation's sub-sections.
+            part = None
+            part_records = dict((name, []) for name in SUBSTATION_PARTS)
+            substation_number = None
+            for line in lines:
+                if part is not None:
+                    part_name = SUBSTATION_PARTS[part]
+                    if is_section_end(line):
+                        part += 1
+                        if part == len(SUBSTATION_PARTS):
+                            part = None
+                    else:
+                        part_records[part_name].append(
+                            "%s, %s" % (substation_number, line)
+                        )
+                        if len(part_records[part_name]) >= chunk_records:
+                            submit(part_name, part_records[part_name])
+                            part_records[part_name] = []
+                    continue
+
+                if not record and is_section_end(line):
+                    submit(section, records)
+                    records = []
+                    section_index += 1
+                    if line.lstrip()[:1] in ("Q", "q") or section_index >= len(
+                        section_order
+                    ):
+                        break
+                    section = section_order[section_index]
+                    continue
+
+                if section != "transformer" and section not in RECORD_LINES:
+                    # One line per record, the common case.
+                    records.append(line)
+                    if section == "substation":
+                        substation_number = (split_record(line) or ["0"])[0]
+                        part = 0
+                else:
+                    if not record:
+                        record_lines = get_record_lines(section, line)
+                    record.append(line)
+                    if len(record) < record_lines:
+                        continue
+                    records.append("\n".join(record))
+                    record = []
+
+                if len(records) >= chunk_records:
+                    submit(section, records)
+                    records = []
+
+            if record or part is not None:
+                raise RawParseError(
+                    "%s ends part way through a %s record." % (path, section)
+                )
+            submit(section, records)
+            for name in SUBSTATION_PARTS:
+                submit(name, part_records[name])
+            collect(0)
+    finally:
+        executor.shutdown()
+
+    sections = dict(
+        (section, concat_columns(section_chunks)) for section, section_chunks in chunks.items()
+    )
+    return RawCase(version, header, titles, sections)
@@ -0,0 +1,245 @@
+"""Switch between scenarios of one base case without reloading it.
+
+A Scenario is a set of element changes against a base case. The
+ScenarioManager remembers the base values of everything a scenario
+changed, so switching scenario only reverts and applies the differences in
+memory instead of reading the saved case from disk again:
+
+    import pssepath
+    pssepath.add_pssepath()
+
+    import psspy
+    psspy.psseinit(50000)
+
+    from pssepath.scenario import ScenarioManager
+
+    manager = ScenarioManager(r"c:\\cases\\base.sav")
+    high_load = manager.scenario("high load")
+    high_load.set("load", (101, "1"), PL=120.0, QL=30.0)
+    outage = manager.scenario("outage")
+    outage.set("branch", (101, 102, "1"), STATUS=0)
+
+    for name in ("high load", "outage"):
+        manager.activate(name)
+        psspy.fnsl()
+
+See pssepath.elements for the element kinds and fields. Changes that can't
+be undone in memory are added with Scenario.call(). Leaving a scenario with
+one of these, or failing to revert a change, reloads the base case.
+
+Base values are read right after the base case is loaded, so they never
+pick up a solved state. Activating a scenario that changes fields not read
+then (eg. one defined after the manager was created) reloads the base case
+once to read them. To avoid that, define the scenarios first and create the
+manager with load_case=False, then call reload().
+
+Only the scenario's own changes are reverted. Whatever a solve changed, like
+bus voltages, transformer taps, switched shunts and machine reactive power,
+is where the next scenario starts from, so solutions can depend on the order
+scenarios are solved in. Use a flat start, or reload() between scenarios, if
+that matters.
+"""
+import logging
+
+from . import network
+from .core import PsspyError
+from .elements import get_element_kind
+
+
+logger = logging.getLogger(__name__)
+
+
+class Scenario(object):
+    """Element changes and one-way psspy calls against the base case."""
+
+    def __init__(self, name):
+        self.name = name
+        self.changes = {}
+        self.calls = []
+
+    def set(self, kind, key, **values):
+        """Set fields of an element, eg. set("load", (101, "1"), PL=10.0)."""
+        element_kind = get_element_kind(kind)
+        key = element_kind.normalize_key(key)
+        element_kind.check_fields(values)
+        self.changes.setdefault((kind, key), {}).update(values)
+        return self
+
+    def call(self, fn, *args, **kwargs):
+        """Add a psspy call (name or callable taking psspy) that can't be reverted."""
+        self.calls.append((fn, args, kwargs))
+        return self
+
+    def reversible(self):
+        return not self.calls
+
+
+class ScenarioManager(object):
+    """Keeps track of the scenario applied to the case loaded in psspy.
+
+    load_case: load base_case now. Pass False if it is already loaded.
+    """
+
+    def __init__(self, base_case, psspy=None, load_case=True):
+        if psspy is None:
+            import psspy
+        self.psspy = psspy
+        self.base_case = base_case
+        self.scenarios = {}
+        self.active = None
+        self.reloads = 0
+        # {(kind, key): {field: value}} as they are in the base case.
+        self._base_values = {}
+        # {(kind, key): {field: value}} as they are now in psspy.
+        self._applied = {}
+        if load_case:
+            self.reload()
+
+    def scenario(self, name):
+        """Return the scenario called name, creating it if required."""
+        if name not in self.scenarios:
+            self.scenarios[name] = Scenario(name)
+        return self.scenarios[name]
+
+    def reload(self, scenarios=()):
+        """Load the base case from disk, forgetting every applied change.
+
+        Reads the base values changed by the manager's scenarios and any
+        others in 'scenarios'.
+        """
+        ierr = self.psspy.case(self.base_case)
+        if ierr:
+            raise PsspyError(
+                "psspy.case(%r) returned ierr=%s" % (self.base_case, ierr), ierr
+            )
+        self.reloads += 1
+        self._base_values = {}
+        self._applied = {}
+        self.active = None
+        network.invalidate_all()
+        for scenario in list(self.scenarios.values()) + list(scenarios):
+            self.read_base_values(scenario)
+
+    def missing_base_values(self, scenario):
+        """Return {(kind, key): [field]} changed by scenario without a base value."""
+        missing = {}
+        for element, values in scenario.changes.items():
+            base_values = self._base_values.get(element, {})
+            fields = [field for field in values if field not in base_values]
+            if fields:
+                missing[element] = fields
+        return missing
+
+    def read_base_values(self, scenario):
+        # Only call straight after loading the case, before anything changed it.
+        for (kind, key), fields in self.missing_base_values(scenario).items():
+            self._base_values.setdefault((kind, key), {}).update(
+                get_element_kind(kind).read(self.psspy, key, fields)
+            )
+
+    def base_value(self, kind, key, field):
+        return self._base_values[(kind, key)][field]
+
+    def target_values(self, scenario):
+        """Return {(kind, key): {field: value}} that need writing for scenario."""
+        targets = {}
+        elements = set(self._applied) | set(scenario.changes)
+        for element in elements:
+            kind, key = element
+            applied = self._applied.get(element, {})
+            wanted = scenario.changes.get(element, {})
+            writes = {}
+            for field in set(applied) | set(wanted):
+                if field in wanted:
+                    value = wanted[field]
+                else:
+                    value = self.base_value(kind, key, field)
+                current = applied.get(field, self.base_value(kind, key, field))
+                if current != value:
+                    writes[field] = value
+            if writes:
+                targets[element] = writes
+        return targets
+
+    def write(self, targets):
+        """Write the targets, returning [(kind, key, ierr)] of failed writes."""
+        failures = []
+        for (kind, key), values in sorted(targets.items()):
+            try:
+                ierr = get_element_kind(kind).write(self.psspy, key, values)
+            except Exception:
+                logger.debug("Writing %s %s failed", kind, key, exc_info=True)
+                ierr = None
+            if ierr:
+                failures.append((kind, key, ierr))
+            elif ierr is None:
+                failures.append((kind, key, None))
+            else:
+                applied = self._applied.setdefault((kind, key), {})
+                for field, value in values.items():
+                    if value == self._base_values[(kind, key)][field]:
+                        applied.pop(field, None)
+                    else:
+                        applied[field] = value
+                if not applied:
+                    del self._applied[(kind, key)]
+        return failures
+
+    def apply_calls(self, scenario):
+        from .executor import normalize_call, resolve_call
+
+        for call in scenario.calls:
+            fn, args, kwargs = normalize_call(call)
+            if callable(fn):
+                fn(self.psspy, *args, **kwargs)
+            else:
+                resolve_call(self.psspy, fn)(*args, **kwargs)
+
+    def activate(self, scenario):
+        """Make scenario (a Scenario or its name) the one applied to the case.
+
+        Reverts and applies only the fields that differ from what is applied
+        now. Falls back to reloading the base case if the active scenario
+        can't be reverted, a base value is missing or a write fails.
+        """
+        if not isinstance(scenario, Scenario):
+            scenario = self.scenarios[scenario]
+
+        if self.active is not None and not self.active.reversible():
+            self.reload([scenario])
+        elif self.missing_base_values(scenario):
+            logger.info(
+                "Reloading %s to read the base values scenario %r changes",
+                self.base_case,
+                scenario.name,
+            )
+            self.reload([scenario])
+
+        targets = self.target_values(scenario)
+        if self.active is scenario and not targets and scenario.reversible():
+            # Nothing changed since it was applied.
+            return
+
+        failures = self.write(targets)
+        if failures:
+            logger.info(
+                "Reloading %s, could not switch to scenario %r in memory: %s",
+                self.base_case,
+                scenario.name,
+                failures,
+            )
+            self.reload([scenario])
+            failures = self.write(self.target_values(scenario))
+            if failures:
+                raise PsspyError(
+                    "Could not apply scenario %r, failed writes: %s"
+                    % (scenario.name, failures)
+                )
+
+        self.apply_calls(scenario)
+        self.active = scenario
+        network.invalidate_all()
+
+    def revert(self):
+        """Go back to the base case."""
+        self.activate(Scenario(None))
@@ -0,0 +1,302 @@
+"""DC contingency screening of branch outages.
+
+Estimates the branch flows after every single branch outage with line
+outage distribution factors (LODF) from a DC model of the network, so only
+the outages likely to overload something need a full AC solution:
+
+    import pssepath
+    pssepath.add_pssepath()
+
+    import psspy
+    psspy.psseinit(50000)
+    psspy.case(r"c:\\cases\\base.sav")
+    psspy.fnsl()
+
+    from pssepath.screening import DcScreening
+
+    screening = DcScreening.from_session()
+    results = screening.screen(threshold=0.9)
+    for outage in results[results["OVERLOADS"] > 0]:
+        ...  # run an AC solution for this outage
+
+Three-winding transformers are modelled as a branch from each winding's bus
+to a star point bus. Star points are numbered -1, -2, ... so they can't
+clash with real buses, and a winding appears in the results with its
+winding bus as FROMNUMBER and its star point as TONUMBER.
+
+The post-outage flows are the solved base case flows plus LODF times the
+flow on the outaged branch. The sensitivities are found by factorising the
+sparse DC susceptance matrix once and solving for a chunk of outages at a
+time, so the full LODF matrix is never held in memory.
+
+Requires NumPy and SciPy.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import scipy.sparse as sparse
+    from scipy.sparse.csgraph import connected_components
+    from scipy.sparse.linalg import splu
+except ImportError:
+    sparse = None
+
+
+# PSSE treats branches with a smaller reactance as zero impedance lines.
+ZERO_IMPEDANCE_X = 0.0001
+
+# Outages where 1 - PTDF of the outaged branch is below this split the network.
+ISLANDING_TOLERANCE = 1e-6
+
+BUS_TYPE_SWING = 3
+BUS_TYPE_ISOLATED = 4
+
+# Three-winding transformer STATUS values with one winding out of service,
+# {status: winding number}. 0 is all out and 1 all in service.
+WINDING_OUT_OF_SERVICE = {2: 2, 3: 3, 4: 1}
+
+RESULT_DTYPE = [
+    ("BRANCH", "i4"),
+    ("FROMNUMBER", "i4"),
+    ("TONUMBER", "i4"),
+    ("ID", "U2"),
+    ("ISLANDING", "?"),
+    ("MAXLOADING", "f8"),
+    ("WORSTBRANCH", "i4"),
+    ("OVERLOADS", "i4"),
+]
+
+
+def require_scipy():
+    if np is None or sparse is None:
+        raise ImportError(
+            "pssepath.screening requires NumPy and SciPy: pip install numpy scipy"
+        )
+
+
+def default_rating_field():
+    """The branch rating used when none is given: RATEA, or RATE1 on PSSE 35+."""
+    from . import core
+
+    if core.PSSE_VERSION is not None and core.PSSE_VERSION >= 35:
+        return "RATE1"
+    return "RATEA"
+
+
+class DcScreening(object):
+    """A factorised DC model of a network for screening branch outages.
+
+    bus_numbers: bus numbers in service.
+    swing_buses: bus numbers used as the angle reference of their island.
+        Islands without one use their first bus.
+    from_buses, to_buses, reactance: per in-service branch, reactance in pu.
+    flows: base case MW flow from the from bus, eg. from a solved AC case.
+    ratings: MVA rating per branch. Branches rated 0 aren't monitored.
+    ids: optional branch circuit ids, used in the results.
+    """
+
+    def __init__(
+        self,
+        bus_numbers,
+        swing_buses,
+        from_buses,
+        to_buses,
+        reactance,
+        flows,
+        ratings,
+        ids=None,
+    ):
+        require_scipy()
+        bus_numbers = np.asarray(bus_numbers)
+        self.from_buses = np.asarray(from_buses)
+        self.to_buses = np.asarray(to_buses)
+        self.flows = np.asarray(flows, dtype=np.float64)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        if ids is None:
+            ids = np.full(len(self.from_buses), "1")
+        self.ids = np.asarray(ids)
+
+        x = np.abs(np.asarray(reactance, dtype=np.float64))
+        x = np.maximum(x, ZERO_IMPEDANCE_X)
+        self.susceptance = 1.0 / x
+
+        # Bus numbers to matrix positions.
+        order = np.argsort(bus_numbers)
+        sorted_numbers = bus_numbers[order]
+        from_index = order[np.searchsorted(sorted_numbers, self.from_buses)]
+        to_index = order[np.searchsorted(sorted_numbers, self.to_buses)]
+        if not (
+            np.array_equal(bus_numbers[from_index], self.from_buses)
+            and np.array_equal(bus_numbers[to_index], self.to_buses)
+        ):
+            raise ValueError("Branches connect buses missing from bus_numbers.")
+
+        num_buses = len(bus_numbers)
+        num_branches = len(self.from_buses)
+        branches = np.arange(num_branches)
+        # Branch-bus incidence matrix, +1 at the from bus and -1 at the to bus.
+        self.incidence = sparse.csr_matrix(
+            (
+                np.concatenate([np.ones(num_branches), -np.ones(num_branches)]),
+                (np.concatenate([branches, branches]), np.concatenate([from_index, to_index])),
+            ),
+            shape=(num_branches, num_buses),
+        )
+        susceptance = self.incidence.T.dot(
+            sparse.diags(self.susceptance).dot(self.incidence)
+        )
+
+        # One angle reference per island keeps the matrix non-singular.
+        num_islands, island = connected_components(
+            abs(susceptance) > 0, directed=False
+        )
+        is_swing = np.isin(bus_numbers, np.asarray(swing_buses))
+        references = []
+        for number in range(num_islands):
+            members = np.flatnonzero(island == number)
+            swing = members[is_swing[members]]
+            references.append(swing[0] if len(swing) else members[0])
+        keep = np.ones(num_buses, dtype=bool)
+        keep[references] = False
+        self.reduced = np.flatnonzero(keep)
+        self._incidence_reduced = self.incidence[:, self.reduced].tocsc()
+        self._factor = splu(susceptance[self.reduced][:, self.reduced].tocsc())
+
+    @classmethod
+    def from_session(cls, psspy=None, rating=None, sid=-1):
+        """Build the DC model from the case in psspy, see NetworkData.
+
+        rating: the branch rating field, by default default_rating_field().
+        """
+        from .network import NetworkData
+
+        data = NetworkData(psspy, sid=sid)
+        if rating is None:
+            rating = default_rating_field()
+        buses = data.buses(["NUMBER", "TYPE"])
+        buses = buses[buses["TYPE"] != BUS_TYPE_ISOLATED]
+        branches = data.branches(
+            ["FROMNUMBER", "TONUMBER", "ID", "STATUS", "RX", "P", rating]
+        )
+        branches = branches[branches["STATUS"] != 0]
+        windings = data.windings(
+            [
+                "WIND1NUMBER",
+                "WIND2NUMBER",
+                "WIND3NUMBER",
+                "ID",
+                "WNDNUM",
+                "STATUS",
+                "RX",
+                "P",
+                rating,
+            ]
+        )
+        from_buses, star_buses, windings = winding_branches(windings)
+        return cls(
+            np.concatenate([buses["NUMBER"], np.unique(star_buses)]),
+            buses["NUMBER"][buses["TYPE"] == BUS_TYPE_SWING],
+            np.concatenate([branches["FROMNUMBER"], from_buses]),
+            np.concatenate([branches["TONUMBER"], star_buses]),
+            np.concatenate([branches["RX"].imag, windings["RX"].imag]),
+            np.concatenate([branches["P"], windings["P"]]),
+            np.concatenate([branches[rating], windings[rating]]),
+            np.concatenate([branches["ID"], windings["ID"]]),
+        )
+
+    def ptdf_columns(self, outages):
+        """Return the change in every branch flow per MW moved across outages.
+
+        A num_branches x len(outages) array: column j is the flow on each
+        branch when 1 MW is injected at the from bus of branch outages[j]
+        and taken out at its to bus.
+        """
+        injections = self._incidence_reduced[outages].T.toarray()
+        angles = self._factor.solve(injections)
+        return self.susceptance[:, None] * self._incidence_reduced.dot(angles)
+
+    def lodf_columns(self, outages):
+        """Return (lodf, islanding) for the outages.
+
+        lodf: num_branches x len(outages), the share of each outaged
+            branch's flow moving onto each branch. Zero for islanding outages.
+        islanding: per outage, True where the outage splits the network.
+        """
+        outages = np.asarray(outages)
+        ptdf = self.ptdf_columns(outages)
+        denominator = 1.0 - ptdf[outages, np.arange(len(outages))]
+        islanding = np.abs(denominator) < ISLANDING_TOLERANCE
+        denominator[islanding] = np.inf
+        lodf = ptdf / denominator
+        # The outaged branch loses all of its flow.
+        lodf[outages, np.arange(len(outages))] = -1.0
+        lodf[:, islanding] = 0.0
+        return lodf, islanding
+
+    def screen(self, outages=None, threshold=1.0, chunk_size=256):
+        """Estimate the loading after each branch outage.
+
+        outages: branch positions to outage, every branch by default.
+        threshold: loading (flow / rating) counted as an overload.
+        chunk_size: outages solved together, bounding memory use to
+            num_branches x chunk_size floats.
+
+        Returns a structured array ordered riskiest first: outages that
+        split the network, then by MAXLOADING. WORSTBRANCH is the position
+        of the most loaded branch, -1 if nothing is monitored.
+        """
+        if outages is None:
+            outages = np.arange(len(self.flows))
+        outages = np.asarray(outages)
+        monitored = self.ratings > 0
+        inverse_rating = np.zeros(len(self.ratings))
+        inverse_rating[monitored] = 1.0 / self.ratings[monitored]
+
+        results = np.zeros(len(outages), dtype=RESULT_DTYPE)
+        results["BRANCH"] = outages
+        results["FROMNUMBER"] = self.from_buses[outages]
+        results["TONUMBER"] = self.to_buses[outages]
+        results["ID"] = self.ids[outages]
+        results["WORSTBRANCH"] = -1
+        if not monitored.any():
+            return results
+
+        for start in range(0, len(outages), chunk_size):
+            chunk = outages[start : start + chunk_size]
+            lodf, islanding = self.lodf_columns(chunk)
+            post_flows = self.flows[:, None] + lodf * self.flows[chunk][None, :]
+            loading = np.abs(post_flows) * inverse_rating[:, None]
+            worst = np.argmax(loading, axis=0)
+            rows = slice(start, start + len(chunk))
+            results["ISLANDING"][rows] = islanding
+            results["MAXLOADING"][rows] = loading[worst, np.arange(len(chunk))]
+            results["WORSTBRANCH"][rows] = worst
+            results["OVERLOADS"][rows] = np.count_nonzero(loading > threshold, axis=0)
+
+        riskiest = np.lexsort((-results["MAXLOADING"], ~results["ISLANDING"]))
+        return results[riskiest]
+
+
+def winding_branches(windings):
+    """Return (winding buses, star point buses, windings) of in-service windings.
+
+    windings: a structured array of windings from NetworkData.windings().
+    Each transformer gets its own negative star point bus number.
+    """
+    winding_numbers = windings["WNDNUM"]
+    out_of_service = np.array(
+        [WINDING_OUT_OF_SERVICE.get(status, 0) for status in windings["STATUS"].tolist()],
+        dtype=winding_numbers.dtype,
+    )
+    in_service = (windings["STATUS"] != 0) & (out_of_service != winding_numbers)
+    windings = windings[in_service]
+    winding_numbers = winding_numbers[in_service]
+
+    bus_columns = [windings["WIND%iNUMBER" % (number,)] for number in (1, 2, 3)]
+    winding_buses = np.choose(winding_numbers - 1, bus_columns)
+    transformers = np.rec.fromarrays(bus_columns + [windings["ID"]])
+    _, transformer = np.unique(transformers, return_inverse=True)
+    star_buses = -1 - transformer.reshape(-1)
+    return winding_buses, star_buses, windings
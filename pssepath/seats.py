@@ -0,0 +1,351 @@
+"""Limit how many PSSE sessions run at once across a host or a shared dir.
+
+PSSE licences cap the number of concurrent sessions. Processes that start
+beyond the cap fail late, so instead each session takes a seat from a
+counting semaphore kept as files in a directory:
+
+    pssepath.add_pssepath(35, licence_seats={34: 2, 35: 4})
+
+The seat is held until the process exits or release_licence_seat() is
+called. Point PSSEPATH_SEATS_DIR (or seats_dir) at a network share to count
+seats across several machines.
+
+The seats of every PSSE x.y release share one directory per major
+version, since that is what a licence covers. Layout of that directory:
+
+    seat-<n>         one file per taken seat, created exclusively.
+    queue/<ticket>   one file per waiting process, named so they sort by
+                     arrival. Seats go to the oldest tickets first.
+
+Each file holds "<hostname> <pid> <process start time>". Seats and tickets
+left behind by dead processes are removed: immediately if the process was
+on this host (the start time tells it apart from a new process reusing the
+pid), otherwise once the file hasn't been touched for 'stale_after'
+seconds.
+Holders and waiters rewrite their files well within that time. File ages
+are measured against the directory's own clock (the mtime of a new file),
+so clock differences between hosts sharing the dir don't matter.
+"""
+import atexit
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from . import helpers
+from .core import PsseImportError
+
+
+logger = logging.getLogger(__name__)
+
+
+SEATS_DIR_ENV_VAR = "PSSEPATH_SEATS_DIR"
+
+_held_seat = None
+
+
+class PsseSeatTimeout(PsseImportError):
+    pass
+
+
+def get_default_seats_dir():
+    """Return PSSEPATH_SEATS_DIR or a host wide dir for the seat files."""
+    seats_dir = os.environ.get(SEATS_DIR_ENV_VAR)
+    if seats_dir:
+        return seats_dir
+    # ProgramData is shared by all users, unlike the per user temp dir.
+    base_dir = os.environ.get("PROGRAMDATA", tempfile.gettempdir())
+    return os.path.join(base_dir, "pssepath", "seats")
+
+
+def get_capacity(licence_seats, psse_ver):
+    """Return the number of seats for psse_ver.
+
+    licence_seats is an int for every version or a dict of {psse_ver: seats}.
+    A dict may hold the major version (35 for 35.5) or None as the default.
+    """
+    if not isinstance(licence_seats, dict):
+        return licence_seats
+    for key in (psse_ver, int(psse_ver), None):
+        if key in licence_seats:
+            return licence_seats[key]
+    return None
+
+
+def read_owner(path):
+    """Return (hostname, pid, start time) written in a seat or ticket file or None.
+
+    The start time is None if it wasn't known to the owner.
+    """
+    try:
+        with open(path) as owner_file:
+            hostname, pid, start_time = owner_file.read().split()
+        return hostname, int(pid), None if start_time == "-" else start_time
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class LicenceSeats(object):
+    """A counting semaphore backed by files in 'directory'."""
+
+    def __init__(self, capacity, directory, poll_interval=0.5, stale_after=120):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1, not %r" % (capacity,))
+        self.capacity = capacity
+        self.directory = directory
+        self.queue_dir = os.path.join(directory, "queue")
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.hostname = socket.gethostname()
+        pid = os.getpid()
+        self.owner = "%s %i %s" % (
+            self.hostname,
+            pid,
+            helpers.get_process_start_time(pid) or "-",
+        )
+        self.seat_path = None
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def seat_paths(self):
+        return [
+            os.path.join(self.directory, "seat-%i" % (seat,))
+            for seat in range(self.capacity)
+        ]
+
+    def directory_time(self):
+        """Return the time by the seat directory's clock.
+
+        Seat files on a share get their mtimes from the file server, so
+        other hosts' files are aged by its clock rather than the local one.
+        """
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix="clock-", suffix=".tmp")
+        os.close(fd)
+        try:
+            return os.path.getmtime(path)
+        finally:
+            os.remove(path)
+
+    def owns(self, path):
+        try:
+            with open(path) as owner_file:
+                return owner_file.read() == self.owner
+        except (IOError, OSError):
+            return False
+
+    def touch(self, path):
+        """Rewrite one of our files so its mtime shows we are still here.
+
+        Returns False without writing if the file is gone or names another
+        owner, eg. after another process judged it stale and took it over.
+        """
+        # Writing, unlike os.utime(), leaves the mtime to the file server.
+        # "r+" never creates the file, and the owner is read and rewritten
+        # through one handle: if the file is replaced meanwhile, the write
+        # goes to the removed file (Windows won't remove an open file).
+        try:
+            owner_file = open(path, "r+")
+        except (IOError, OSError):
+            return False
+        with owner_file:
+            if owner_file.read() != self.owner:
+                return False
+            owner_file.seek(0)
+            owner_file.write(self.owner)
+        return True
+
+    def is_stale(self, path, now=None):
+        """True if the owner of a seat or ticket file is gone.
+
+        now: directory_time(), read if not given.
+        """
+        owner = read_owner(path)
+        if owner is not None and owner[0] == self.hostname:
+            hostname, pid, start_time = owner
+            if not helpers.pid_is_alive(pid):
+                return True
+            # A different process now has the pid.
+            return start_time is not None and start_time != (
+                helpers.get_process_start_time(pid) or start_time
+            )
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        if now is None:
+            now = self.directory_time()
+        return now - mtime > self.stale_after
+
+    def remove_stale(self, paths):
+        now = None
+        for path in paths:
+            owner = read_owner(path)
+            if not os.path.exists(path):
+                continue
+            if now is None and (owner is None or owner[0] != self.hostname):
+                now = self.directory_time()
+            if self.is_stale(path, now):
+                # Best effort check that the file wasn't replaced meanwhile.
+                if read_owner(path) != owner:
+                    continue
+                logger.info("Removing stale PSSE seat file %s (%s)", path, owner)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def write_ticket(self):
+        ticket = "%020i-%s-%i" % (time.time() * 1e6, self.hostname, os.getpid())
+        path = os.path.join(self.queue_dir, ticket)
+        with open(path, "w") as ticket_file:
+            ticket_file.write(self.owner)
+        return path
+
+    def try_take_seat(self):
+        for path in self.seat_paths():
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError:
+                continue
+            os.write(fd, self.owner.encode("ascii"))
+            os.close(fd)
+            return path
+        return None
+
+    def acquire(self, timeout=None):
+        """Wait for a seat, first come first served.
+
+        Raises PsseSeatTimeout if no seat is free within timeout seconds.
+        """
+        if self.seat_path is not None:
+            return self.seat_path
+
+        if not os.path.isdir(self.queue_dir):
+            try:
+                os.makedirs(self.queue_dir)
+            except OSError:
+                # Another process made it first.
+                pass
+
+        deadline = None if timeout is None else time.time() + timeout
+        ticket = self.write_ticket()
+        ticket_name = os.path.basename(ticket)
+        try:
+            while True:
+                self.remove_stale(self.seat_paths())
+                tickets = sorted(os.listdir(self.queue_dir))
+                self.remove_stale(
+                    os.path.join(self.queue_dir, name)
+                    for name in tickets
+                    if name != ticket_name
+                )
+                tickets = sorted(os.listdir(self.queue_dir))
+                free_seats = self.capacity - sum(
+                    1 for path in self.seat_paths() if os.path.exists(path)
+                )
+                if tickets.index(ticket_name) < free_seats:
+                    self.seat_path = self.try_take_seat()
+                    if self.seat_path is not None:
+                        break
+
+                if deadline is not None and time.time() >= deadline:
+                    raise PsseSeatTimeout(
+                        "Timed out after %ss waiting for one of %i PSSE licence "
+                        "seats in %s" % (timeout, self.capacity, self.directory)
+                    )
+                time.sleep(self.poll_interval)
+                # Show we are still waiting.
+                if not self.touch(ticket):
+                    logger.warning(
+                        "PSSE seat queue ticket %s was removed, queueing again", ticket
+                    )
+                    ticket = self.write_ticket()
+                    ticket_name = os.path.basename(ticket)
+        finally:
+            try:
+                os.remove(ticket)
+            except OSError:
+                pass
+
+        self.start_heartbeat()
+        return self.seat_path
+
+    def start_heartbeat(self):
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, args=(self.seat_path,)
+        )
+        self._heartbeat_thread.daemon = True
+        self._heartbeat_thread.start()
+
+    def _heartbeat(self, seat_path):
+        interval = self.stale_after / 3.0
+        while not self._heartbeat_stop.wait(interval):
+            if not self.touch(seat_path):
+                logger.warning(
+                    "PSSE seat file %s was removed or taken over by another "
+                    "process, no longer holding it",
+                    seat_path,
+                )
+                return
+
+    def release(self):
+        if self.seat_path is None:
+            return
+        self._heartbeat_stop.set()
+        # A heartbeat part way through touch() must finish before the file
+        # is removed.
+        thread = self._heartbeat_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._heartbeat_thread = None
+        # Leave a seat taken over by another process alone.
+        if self.owns(self.seat_path):
+            try:
+                os.remove(self.seat_path)
+            except OSError:
+                pass
+        self.seat_path = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def acquire_psse_seat(psse_ver, licence_seats, seats_dir=None, timeout=None):
+    """Take a seat for psse_ver, held until release_licence_seat() or exit.
+
+    Does nothing if licence_seats has no capacity for psse_ver.
+    """
+    global _held_seat
+
+    capacity = get_capacity(licence_seats, psse_ver)
+    if not capacity or _held_seat is not None:
+        return _held_seat
+
+    if seats_dir is None:
+        seats_dir = get_default_seats_dir()
+    # One pool for all releases of a major version, like get_capacity().
+    # The version of a PSSE already on the path may be unknown.
+    pool = "psse" if psse_ver is None else "psse%i" % (int(psse_ver),)
+    directory = os.path.join(seats_dir, pool)
+    seat = LicenceSeats(capacity, directory)
+    logger.debug("Waiting for one of %i PSSE %s licence seats", capacity, psse_ver)
+    seat.acquire(timeout)
+    _held_seat = seat
+    atexit.register(release_licence_seat)
+    return seat
+
+
+def release_licence_seat():
+    """Give back the seat taken by add_pssepath(licence_seats=...)."""
+    global _held_seat
+
+    if _held_seat is not None:
+        _held_seat.release()
+        _held_seat = None
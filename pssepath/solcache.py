@@ -0,0 +1,305 @@
+"""Reuse power flow solutions of network states solved before.
+
+Optimisation loops often solve the same base case with the same
+modifications more than once. SolutionCache keys each solution on the base
+case file plus a description of the modifications applied to it, and on a
+repeat restores the solved bus voltages and machine outputs instead of
+running the solver:
+
+    from pssepath.scenario import ScenarioManager
+    from pssepath.solcache import SolutionCache
+
+    manager = ScenarioManager(r"c:\\cases\\base.sav")
+    cache = SolutionCache(directory=r"c:\\cache\\solutions")
+
+    for name in candidates:
+        manager.activate(name)
+        solution = cache.solve(manager.active, base_case=manager.base_case)
+        losses = solution.branches["P"]
+
+modifications can be a Scenario or anything describing the changes made
+since the base case was loaded, eg. a dict. It is only used to build the
+key, so it must describe every change that affects the solution.
+
+A hit doesn't run the solver, so psspy's own results (eg. branch flows
+from psspy.abrnreal or psspy.solved()) aren't brought up to date: only the
+cached Solution's values can be trusted. Controls the solver adjusts, like
+transformer taps and switched shunts, aren't restored either. With
+finish_solve=True the solver runs once more from the restored voltages,
+which usually takes no more than an iteration and leaves psspy with a
+converged case. If that doesn't converge the cached solution is dropped and
+the new result returned.
+
+Solutions are kept in a bounded LRU in memory and, if a directory is given,
+as .npz files on disk shared by later runs. They are read without unpickling,
+so a shared directory can't run code in the reader. Requires NumPy.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import network
+from .batch import WriteBatch
+
+
+logger = logging.getLogger(__name__)
+
+BUS_FIELDS = ("NUMBER", "PU", "ANGLED")
+MACHINE_FIELDS = ("NUMBER", "ID", "PGEN", "QGEN")
+BRANCH_FIELDS = ("FROMNUMBER", "TONUMBER", "ID", "P", "Q")
+
+
+class Solution(object):
+    """A solved network state: structured arrays of buses, machines, branches."""
+
+    def __init__(self, key, ierr, buses, machines, branches):
+        self.key = key
+        self.ierr = ierr
+        self.buses = buses
+        self.machines = machines
+        self.branches = branches
+
+
+def canonical(value):
+    """Return value with dicts and sets in a repeatable order for hashing."""
+    if hasattr(value, "tolist"):
+        # NumPy arrays and scalars, hashed the same as the equal Python values.
+        return canonical(value.tolist())
+    changes = getattr(value, "changes", None)
+    if changes is not None:
+        # A pssepath.scenario.Scenario
+        return ("scenario", canonical(changes), canonical(value.calls))
+    if isinstance(value, dict):
+        return tuple(sorted((canonical(k), canonical(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(canonical(item) for item in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(item) for item in value)
+    if callable(value):
+        return "%s.%s" % (value.__module__, getattr(value, "__name__", repr(value)))
+    return value
+
+
+def case_fingerprint(path):
+    """Identify a case file by path, size and modification time."""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, stat.st_size, stat.st_mtime)
+
+
+class SolutionCache(object):
+    """Memoizing wrapper around a psspy solver.
+
+    solver, solver_args, solver_kwargs: the psspy solution function and
+        its arguments, eg. "fnsl", (), {"options1": 1}. Part of the key.
+    max_entries: solutions kept in memory.
+    directory: optional directory of pickled solutions.
+    finish_solve: also run the solver after restoring a hit, see the module
+        docs.
+    """
+
+    def __init__(
+        self,
+        psspy=None,
+        solver="fnsl",
+        solver_args=(),
+        solver_kwargs=None,
+        max_entries=128,
+        directory=None,
+        finish_solve=False,
+    ):
+        network.require_numpy()
+        if psspy is None:
+            import psspy
+        self.psspy = psspy
+        self.solver = solver
+        self.solver_args = tuple(solver_args)
+        self.solver_kwargs = solver_kwargs or {}
+        self.max_entries = max_entries
+        self.directory = directory
+        self.finish_solve = finish_solve
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._solutions = OrderedDict()
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def base_case(self):
+        try:
+            return self.psspy.sfiles()[0]
+        except Exception:
+            return None
+
+    def key(self, modifications=None, base_case=None):
+        """Return the hex digest identifying this solve."""
+        if base_case is None:
+            base_case = self.base_case()
+        description = (
+            case_fingerprint(base_case) if base_case else None,
+            canonical(modifications),
+            (self.solver, canonical(self.solver_args), canonical(self.solver_kwargs)),
+        )
+        return hashlib.sha1(repr(description).encode("utf-8")).hexdigest()
+
+    def solve(self, modifications=None, base_case=None):
+        """Solve the case in psspy, or restore the cached solution. Returns a Solution.
+
+        base_case: the case file the modifications were applied to,
+            psspy.sfiles()[0] by default.
+        """
+        key = self.key(modifications, base_case)
+        solution = self.get(key)
+        if solution is not None:
+            self.restore(solution)
+            if not self.finish_solve:
+                self.hits += 1
+                return solution
+            ierr = self.run_solver()
+            if not ierr and self.converged():
+                self.hits += 1
+                return solution
+            logger.warning(
+                "Cached solution %s didn't converge once restored, dropping it", key
+            )
+            self._solutions.pop(key, None)
+            self.misses += 1
+            return self.snapshot(key, ierr)
+
+        self.misses += 1
+        ierr = self.run_solver()
+        solution = self.snapshot(key, ierr)
+        if not ierr and self.converged():
+            self.put(solution)
+        return solution
+
+    def run_solver(self):
+        return getattr(self.psspy, self.solver)(*self.solver_args, **self.solver_kwargs)
+
+    def converged(self):
+        solved = getattr(self.psspy, "solved", None)
+        # 0 is "met convergence tolerance".
+        return solved is None or solved() == 0
+
+    def snapshot(self, key, ierr):
+        psspy = self.psspy
+        return Solution(
+            key,
+            ierr,
+            network.fetch(psspy, "bus", BUS_FIELDS),
+            network.fetch(psspy, "machine", MACHINE_FIELDS),
+            network.fetch(psspy, "branch", BRANCH_FIELDS),
+        )
+
+    def restore(self, solution):
+        """Write the solution's voltages and machine outputs back to psspy.
+
+        Only elements that differ from the current state are written, with
+        one WriteBatch. Raises BatchWriteError if any write fails.
+        """
+        psspy = self.psspy
+        batch = WriteBatch(psspy)
+        current = network.fetch(psspy, "bus", BUS_FIELDS)
+        buses = changed_rows(current, solution.buses, ("PU", "ANGLED"))
+        batch.set_many("bus", buses, VM=buses["PU"], VA=buses["ANGLED"])
+
+        current = network.fetch(psspy, "machine", MACHINE_FIELDS)
+        machines = changed_rows(current, solution.machines, ("PGEN", "QGEN"))
+        batch.set_many("machine", machines, PG=machines["PGEN"], QG=machines["QGEN"])
+        batch.flush()
+
+    def get(self, key):
+        try:
+            solution = self._solutions.pop(key)
+        except KeyError:
+            solution = self.load(key)
+            if solution is None:
+                return None
+            self.disk_hits += 1
+        self.remember(solution)
+        return solution
+
+    def put(self, solution):
+        self._solutions.pop(solution.key, None)
+        self.remember(solution)
+        self.save(solution)
+
+    def remember(self, solution):
+        # Most recently used last.
+        self._solutions[solution.key] = solution
+        while len(self._solutions) > self.max_entries:
+            self._solutions.popitem(last=False)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key):
+        if not self.directory:
+            return None
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                return Solution(
+                    key,
+                    int(arrays["ierr"]),
+                    arrays["buses"],
+                    arrays["machines"],
+                    arrays["branches"],
+                )
+        except Exception:
+            logger.warning("Ignoring unreadable cached solution %s", path)
+            return None
+
+    def save(self, solution):
+        if not self.directory:
+            return
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as solution_file:
+                np.savez(
+                    solution_file,
+                    ierr=np.array(solution.ierr or 0),
+                    buses=solution.buses,
+                    machines=solution.machines,
+                    branches=solution.branches,
+                )
+            # Other processes sharing the directory never see a partial file.
+            os.replace(temp_path, self.path(solution.key))
+        except Exception:
+            logger.warning("Could not save solution to %s", self.directory, exc_info=True)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Forget the in-memory solutions. Files in directory are kept."""
+        self._solutions.clear()
+
+
+def changed_rows(current, cached, fields):
+    """Return the rows of cached whose fields differ from current."""
+    if len(current) != len(cached) or any(
+        (current[name] != cached[name]).any()
+        for name in cached.dtype.names
+        if name not in fields
+    ):
+        # Different elements, write everything.
+        return cached
+    differs = current[fields[0]] != cached[fields[0]]
+    for field in fields[1:]:
+        differs |= current[field] != cached[field]
+    return cached[differs]
+
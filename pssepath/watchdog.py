@@ -0,0 +1,326 @@
+"""Watch the memory and handle use of a long running PSSE process.
+
+PSSE leaks memory and handles over long sessions, and a worker can slow to
+a crawl long before anything fails. A Watchdog samples the process's
+resident memory (RSS) and open handle count on a background thread and
+calls back when they cross thresholds, so a worker can stop taking work
+and restart while it is still healthy:
+
+    import pssepath
+
+    def drain(watchdog, sample, reasons):
+        stop_accepting_jobs()
+
+    watchdog = pssepath.start_watchdog(
+        drain_rss=3 << 30, restart_rss=4 << 30, drain_handles=5000, on_drain=drain
+    )
+    while not watchdog.restart_needed.is_set():
+        run_next_job()
+
+or with add_pssepath(watchdog=Watchdog(...)). watchdog.metrics() returns
+the latest numbers for reporting.
+
+On Windows the numbers come from GetProcessMemoryInfo (working set) and
+GetProcessHandleCount. Elsewhere they come from /proc (open file
+descriptors count as handles) where available.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from . import helpers
+
+
+logger = logging.getLogger(__name__)
+
+Sample = namedtuple("Sample", ["time", "rss", "handles"])
+
+
+@helpers.memoize
+def get_windows_api():
+    """Return (GetCurrentProcess, GetProcessMemoryInfo, GetProcessHandleCount, counters type)."""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    # Own instances so the prototypes don't change ctypes.windll for others.
+    kernel32 = ctypes.WinDLL("kernel32")
+    psapi = ctypes.WinDLL("psapi")
+
+    # The process pseudo handle comes back as 2**64-1 on 64 bit Windows,
+    # which ctypes can't pass as the default int argument.
+    get_current_process = kernel32.GetCurrentProcess
+    get_current_process.argtypes = []
+    get_current_process.restype = wintypes.HANDLE
+
+    get_memory_info = psapi.GetProcessMemoryInfo
+    get_memory_info.argtypes = [
+        wintypes.HANDLE,
+        ctypes.POINTER(PROCESS_MEMORY_COUNTERS),
+        wintypes.DWORD,
+    ]
+    get_memory_info.restype = wintypes.BOOL
+
+    get_handle_count = kernel32.GetProcessHandleCount
+    get_handle_count.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+    get_handle_count.restype = wintypes.BOOL
+
+    return get_current_process, get_memory_info, get_handle_count, PROCESS_MEMORY_COUNTERS
+
+
+def get_windows_usage():
+    import ctypes
+    from ctypes import wintypes
+
+    get_current_process, get_memory_info, get_handle_count, counters_type = (
+        get_windows_api()
+    )
+    process = get_current_process()
+
+    counters = counters_type()
+    counters.cb = ctypes.sizeof(counters)
+    rss = None
+    if get_memory_info(process, ctypes.byref(counters), ctypes.sizeof(counters)):
+        rss = counters.WorkingSetSize
+
+    handle_count = wintypes.DWORD()
+    handles = None
+    if get_handle_count(process, ctypes.byref(handle_count)):
+        handles = handle_count.value
+    return rss, handles
+
+
+def get_proc_usage():
+    rss = handles = None
+    try:
+        with open("/proc/self/statm") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    try:
+        # Less the descriptor listdir() opens itself.
+        handles = len(os.listdir("/proc/self/fd")) - 1
+    except OSError:
+        pass
+    return rss, handles
+
+
+def get_usage():
+    """Return (rss_bytes, handles) of this process, None where unknown."""
+    if os.name == "nt":
+        return get_windows_usage()
+    return get_proc_usage()
+
+
+class Watchdog(object):
+    """Samples memory and handle use and calls back past thresholds.
+
+    drain_rss, drain_handles: past either, on_drain is called and the
+        draining event set. A worker should finish what it has and stop
+        taking new work.
+    restart_rss, restart_handles: past either, on_restart is called and
+        the restart_needed event set.
+    on_drain, on_restart: called as callback(watchdog, sample, reasons) on
+        the watchdog thread, once each time a threshold is crossed. reasons
+        is a list of strings like "rss 4.1 GB >= 4.0 GB".
+    interval: seconds between samples.
+    history: samples kept for metrics().
+    """
+
+    def __init__(
+        self,
+        drain_rss=None,
+        restart_rss=None,
+        drain_handles=None,
+        restart_handles=None,
+        on_drain=None,
+        on_restart=None,
+        interval=5.0,
+        history=120,
+        usage=get_usage,
+    ):
+        self.thresholds = {
+            "drain": {"rss": drain_rss, "handles": drain_handles},
+            "restart": {"rss": restart_rss, "handles": restart_handles},
+        }
+        self.callbacks = {"drain": on_drain, "restart": on_restart}
+        self.interval = interval
+        self.usage = usage
+        self.samples = deque(maxlen=history)
+        self.peak_rss = None
+        self.peak_handles = None
+        self.draining = threading.Event()
+        self.restart_needed = threading.Event()
+        self._events = {"drain": self.draining, "restart": self.restart_needed}
+        self._tripped = {"drain": False, "restart": False}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling in a thread, again after stop() if needed."""
+        if self._thread is None:
+            # A new event each time, so a thread told to stop (and maybe not
+            # joined, if stop() ran in it) never picks up a later start().
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self.run, args=(self._stop,), name="pssepath-watchdog"
+            )
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def run(self, stop=None):
+        if stop is None:
+            stop = self._stop
+        while not stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Watchdog sample failed")
+            stop.wait(self.interval)
+
+    def sample(self):
+        """Take one sample now and act on it. Returns the Sample."""
+        rss, handles = self.usage()
+        sample = Sample(time.time(), rss, handles)
+        with self._lock:
+            self.samples.append(sample)
+            if rss is not None:
+                self.peak_rss = max(rss, self.peak_rss or 0)
+            if handles is not None:
+                self.peak_handles = max(handles, self.peak_handles or 0)
+
+        for action in ("drain", "restart"):
+            reasons = self.crossed(action, sample)
+            if not reasons:
+                # Arm again once usage is back under every threshold.
+                self._tripped[action] = False
+                continue
+            if self._tripped[action]:
+                continue
+            self._tripped[action] = True
+            self._events[action].set()
+            logger.warning("Watchdog %s: %s", action, ", ".join(reasons))
+            callback = self.callbacks[action]
+            if callback is not None:
+                try:
+                    callback(self, sample, reasons)
+                except Exception:
+                    logger.exception("Watchdog %s callback failed", action)
+        return sample
+
+    def crossed(self, action, sample):
+        reasons = []
+        limits = self.thresholds[action]
+        if limits["rss"] is not None and sample.rss is not None:
+            if sample.rss >= limits["rss"]:
+                reasons.append(
+                    "rss %s >= %s" % (format_bytes(sample.rss), format_bytes(limits["rss"]))
+                )
+        if limits["handles"] is not None and sample.handles is not None:
+            if sample.handles >= limits["handles"]:
+                reasons.append("handles %i >= %i" % (sample.handles, limits["handles"]))
+        return reasons
+
+    def metrics(self):
+        """Return a dict of the latest sample, peaks and growth rates."""
+        with self._lock:
+            samples = list(self.samples)
+            peak_rss = self.peak_rss
+            peak_handles = self.peak_handles
+        latest = samples[-1] if samples else Sample(None, None, None)
+        return {
+            "time": latest.time,
+            "rss": latest.rss,
+            "handles": latest.handles,
+            "peak_rss": peak_rss,
+            "peak_handles": peak_handles,
+            "rss_growth_per_hour": growth_per_hour(samples, "rss"),
+            "handles_growth_per_hour": growth_per_hour(samples, "handles"),
+            "samples": len(samples),
+            "draining": self.draining.is_set(),
+            "restart_needed": self.restart_needed.is_set(),
+        }
+
+
+def growth_per_hour(samples, field):
+    """Least squares slope of field over the samples, per hour."""
+    points = [
+        (sample.time, getattr(sample, field))
+        for sample in samples
+        if getattr(sample, field) is not None
+    ]
+    if len(points) < 2:
+        return None
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / float(len(points))
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if not var_t:
+        return None
+    covariance = sum((t - mean_t) * (v - mean_v) for t, v in points)
+    return covariance / var_t * 3600.0
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return "%.1f %s" % (size, unit) if unit != "B" else "%i B" % (size,)
+        size /= 1024.0
+
+
+_watchdog = None
+
+
+def install_watchdog(watchdog):
+    """Start watchdog (True or a Watchdog) as the process's watchdog."""
+    global _watchdog
+
+    if watchdog is True:
+        watchdog = Watchdog()
+    if _watchdog is not None and _watchdog is not watchdog:
+        _watchdog.stop()
+    if _watchdog is None:
+        atexit.register(stop_watchdog)
+    _watchdog = watchdog.start()
+    return watchdog
+
+
+def start_watchdog(**kwargs):
+    """Start a Watchdog(**kwargs) for this process and return it."""
+    return install_watchdog(Watchdog(**kwargs))
+
+
+def get_watchdog():
+    """Return the watchdog started for this process or None."""
+    return _watchdog
+
+
+def stop_watchdog():
+    global _watchdog
+
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
@@ -0,0 +1,223 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pssepath.raw import RawParseError, read_raw, split_record  # noqa: E402
+
+
+TRANSFORMERS = """\
+1,2,0,'T1',1,1,1,0.0,0.0,2,'TWO WINDING ',1,1,1.0
+0.001, 0.1, 100.0
+1.025, 110.0, 0.0, 100.0, 110.0, 120.0
+1.0, 33.0
+1,2,3,'T3',1,1,1,0.0,0.0,2,'THREE WINDING',1,1,1.0
+0.002, 0.2, 100.0, 0.003, 0.3, 100.0, 0.004, 0.4, 100.0, 1.0, 0.0
+0.975, 110.0, 5.0
+1.0, 33.0, 0.0
+1.0, 11.0, 0.0
+0 / END OF TRANSFORMER DATA, BEGIN AREA DATA
+"""
+
+TAIL = """\
+1, 1, 0.0, 10.0, 'AREA ONE'
+0 / END OF AREA DATA, BEGIN TWO-TERMINAL DC DATA
+0 / END OF TWO-TERMINAL DC DATA, BEGIN VSC DC LINE DATA
+0 / END OF VSC DC LINE DATA, BEGIN IMPEDANCE CORRECTION DATA
+0 / END OF IMPEDANCE CORRECTION DATA, BEGIN MULTI-TERMINAL DC DATA
+0 / END OF MULTI-TERMINAL DC DATA, BEGIN MULTI-SECTION LINE DATA
+0 / END OF MULTI-SECTION LINE DATA, BEGIN ZONE DATA
+1, 'ZONE, ONE'
+0 / END OF ZONE DATA, BEGIN INTER-AREA TRANSFER DATA
+0 / END OF INTER-AREA TRANSFER DATA, BEGIN OWNER DATA
+1, 'OWNER ONE'
+0 / END OF OWNER DATA, BEGIN FACTS DEVICE DATA
+0 / END OF FACTS DEVICE DATA, BEGIN SWITCHED SHUNT DATA
+0 / END OF SWITCHED SHUNT DATA, BEGIN GNE DEVICE DATA
+0 / END OF GNE DEVICE DATA, BEGIN INDUCTION MACHINE DATA
+0 / END OF INDUCTION MACHINE DATA
+"""
+
+RAW_33 = (
+    """\
+0,   100.00, 33, 0, 1, 50.00     / PSS(R)E-33.4    RAW created
+FIRST TITLE
+
+1,'BUS 1       ', 110.0,3,1,1,1,1.02,0.0,1.1,0.9,1.1,0.9
+2,'BUS 2       ', 110.0,1,1,1,1,1.01,-1.5,1.1,0.9,1.1,0.9
+3,'BUS 3       ',  33.0,1,1,1,1,0.99,-3.0,1.1,0.9,1.1,0.9
+0 / END OF BUS DATA, BEGIN LOAD DATA
+2,'1 ',1,1,1, 10.0, 2.0, 0,0,0,0,1,1,0
+3,'1 ',1,1,1, 20.0, 5.0, 0,0,0,0,1,1,0
+0 / END OF LOAD DATA, BEGIN FIXED SHUNT DATA
+0 / END OF FIXED SHUNT DATA, BEGIN GENERATOR DATA
+1,'1 ', 30.0, 7.0, 999, -999, 1.02, 0, 100, 0,1,0,0,1,1,100,200,0,1,1.0
+0 / END OF GENERATOR DATA, BEGIN BRANCH DATA
+1,     2,'1 ', 0.001, 0.01, 0.0, 100,110,120, 0,0,0,0,1,1,0.0,1,1.0
+0 / END OF BRANCH DATA, BEGIN TRANSFORMER DATA
+"""
+    + TRANSFORMERS
+    + TAIL
+    + "Q\n"
+)
+
+RAW_34 = (
+    """\
+0,   100.00, 34, 0, 1, 50.00     / PSS(R)E-34.5    RAW created
+FIRST TITLE
+SECOND TITLE
+1,'BUS 1       ', 110.0,3,1,1,1,1.02,0.0,1.1,0.9,1.1,0.9
+2,'BUS 2       ', 110.0,1,1,1,1,1.01,-1.5,1.1,0.9,1.1,0.9
+3,'BUS 3       ',  33.0,1,1,1,1,0.99,-3.0,1.1,0.9,1.1,0.9
+0 / END OF BUS DATA, BEGIN LOAD DATA
+0 / END OF LOAD DATA, BEGIN FIXED SHUNT DATA
+0 / END OF FIXED SHUNT DATA, BEGIN GENERATOR DATA
+0 / END OF GENERATOR DATA, BEGIN BRANCH DATA
+1,2,'1 ', 0.001, 0.01, 0.0, 'LINE 1-2', 100,110,120,0,0,0,0,0,0,0,0,0, 0,0,0,0,1,1,0.0, 1,1.0
+0 / END OF BRANCH DATA, BEGIN SYSTEM SWITCHING DEVICE DATA
+1,3,'1 ', 0.0001, 100.0, 100.0, 100.0, 0,0,0,0,0,0,0,0,0, 1,1,2,'BREAKER'
+0 / END OF SYSTEM SWITCHING DEVICE DATA, BEGIN TRANSFORMER DATA
+"""
+    + TRANSFORMERS
+    + TAIL
+    + "Q\n"
+)
+
+RAW_35 = (
+    """\
+@!IC,SBASE,REV,XFRRAT,NXFRAT,BASFRQ
+0,   100.00, 35, 0, 1, 50.00     / PSS(R)E-35.3    RAW created
+FIRST TITLE
+SECOND TITLE
+GENERAL, THRSHZ=0.0001, PQBRAK=0.7, BLOWUP=5.0
+0 / END OF SYSTEM-WIDE DATA, BEGIN BUS DATA
+@!   I,'NAME        ', BASKV, IDE,AREA,ZONE,OWNER, VM,        VA
+1,'BUS 1       ', 110.0,3,1,1,1,1.02,0.0,1.1,0.9,1.1,0.9
+2,'BUS 2       ', 110.0,1,1,1,1,1.01,-1.5,1.1,0.9,1.1,0.9
+3,'BUS 3       ',  33.0,1,1,1,1,0.99,-3.0,1.1,0.9,1.1,0.9
+0 / END OF BUS DATA, BEGIN LOAD DATA
+2,'1 ',1,1,1, 10.0, 2.0, 0,0,0,0,1,1,0, 1.5, 0.5, 1, 'RES'
+0 / END OF LOAD DATA, BEGIN FIXED SHUNT DATA
+0 / END OF FIXED SHUNT DATA, BEGIN GENERATOR DATA
+0 / END OF GENERATOR DATA, BEGIN BRANCH DATA
+0 / END OF BRANCH DATA, BEGIN SYSTEM SWITCHING DEVICE DATA
+0 / END OF SYSTEM SWITCHING DEVICE DATA, BEGIN TRANSFORMER DATA
+"""
+    + TRANSFORMERS
+    + TAIL
+    + """\
+@!  IS,'NAME        ', LATITUDE, LONGITUDE, SRG
+1,'STATION 1   ', 51.5, -0.1, 0.1
+@!  NI,'NAME        ',    I,STATUS,   VM,   VA
+1,'NODE 1      ', 1, 1, 1.02, 0.0
+2,'NODE 2      ', 1, 1, 1.02, 0.0
+0 / END OF SUBSTATION NODE DATA, BEGIN SUBSTATION SWITCHING DEVICE DATA
+1, 2, '1 ', 'BREAKER 1', 2, 1, 1, 0.0001, 100.0, 100.0, 100.0
+0 / END OF SUBSTATION SWITCHING DEVICE DATA, BEGIN SUBSTATION TERMINAL DATA
+1, 1, 'M', '1 '
+0 / END OF SUBSTATION TERMINAL DATA
+2,'STATION 2   ', 51.6, -0.2, 0.1
+1,'NODE 1      ', 2, 1, 1.01, -1.5
+0 / END OF SUBSTATION NODE DATA, BEGIN SUBSTATION SWITCHING DEVICE DATA
+0 / END OF SUBSTATION SWITCHING DEVICE DATA, BEGIN SUBSTATION TERMINAL DATA
+2, 1, 'L', '1 '
+2, 1, 'B', 1, '1 '
+0 / END OF SUBSTATION TERMINAL DATA
+0 / END OF SUBSTATION DATA
+Q
+"""
+)
+
+
+def write_raw(tmp_path, text):
+    path = tmp_path / "case.raw"
+    path.write_text(text)
+    return str(path)
+
+
+def test_split_record():
+    assert split_record("1,'BUS, ONE', 2 3 / comment, 4") == ["1", "BUS, ONE", "2", "3"]
+    assert split_record("1,,3") == ["1", "", "3"]
+    assert split_record(" 0 / END OF BUS DATA") == ["0"]
+
+
+@pytest.mark.parametrize(
+    "text, version", [(RAW_33, 33), (RAW_34, 34), (RAW_35, 35)], ids=["v33", "v34", "v35"]
+)
+def test_sections(tmp_path, text, version):
+    case = read_raw(write_raw(tmp_path, text), workers=1)
+    assert case.version == version
+    assert case.header["SBASE"] == 100.0
+    assert case.titles[0] == "FIRST TITLE"
+
+    assert case["bus"]["I"].tolist() == [1, 2, 3]
+    assert case["bus"]["NAME"].tolist() == ["BUS 1", "BUS 2", "BUS 3"]
+    assert case["bus"]["VA"].tolist() == [0.0, -1.5, -3.0]
+    assert case["area"]["ARNAME"].tolist() == ["AREA ONE"]
+    assert case["zone"]["ZONAME"].tolist() == ["ZONE, ONE"]
+    assert case["owner"]["OWNAME"].tolist() == ["OWNER ONE"]
+    assert "fixed_shunt" not in case
+    assert ("system_switching_device" in case) == (version == 34)
+
+
+def test_version_layouts(tmp_path):
+    case_33 = read_raw(write_raw(tmp_path, RAW_33), workers=1)
+    assert case_33.titles[1] == ""
+    assert case_33["branch"]["RATEB"].tolist() == [110.0]
+    assert case_33["generator"]["PG"].tolist() == [30.0]
+
+    case_34 = read_raw(write_raw(tmp_path, RAW_34), workers=1)
+    assert case_34["branch"]["NAME"].tolist() == ["LINE 1-2"]
+    assert case_34["branch"]["RATE2"].tolist() == [110.0]
+    assert case_34["system_switching_device"]["C19"].tolist() == ["BREAKER"]
+
+    case_35 = read_raw(write_raw(tmp_path, RAW_35), workers=1)
+    assert case_35["system_wide"]["C0"].tolist() == ["GENERAL"]
+    assert case_35["load"]["LOADTYPE"].tolist() == ["RES"]
+    assert case_35["load"]["DGENM"].tolist() == [1]
+
+
+@pytest.mark.parametrize("text", [RAW_33, RAW_34, RAW_35], ids=["v33", "v34", "v35"])
+def test_transformers(tmp_path, text):
+    transformers = read_raw(write_raw(tmp_path, text), workers=1)["transformer"]
+    assert transformers["K"].tolist() == [0, 3]
+    assert transformers["CKT"].tolist() == ["T1", "T3"]
+    assert transformers["NAME"].tolist() == ["TWO WINDING", "THREE WINDING"]
+    assert transformers["X1_2"].tolist() == [0.1, 0.2]
+    assert transformers["WINDV1"].tolist() == [1.025, 0.975]
+    assert transformers["ANG1"].tolist() == [0.0, 5.0]
+    assert transformers["NOMV2"].tolist() == [33.0, 33.0]
+
+
+def test_substations(tmp_path):
+    case = read_raw(write_raw(tmp_path, RAW_35), workers=1)
+    assert case["substation"]["C1"].tolist() == ["STATION 1", "STATION 2"]
+
+    nodes = case["substation_node"]
+    assert nodes["IS"].tolist() == [1, 1, 2]
+    assert nodes["C1"].tolist() == ["NODE 1", "NODE 2", "NODE 1"]
+    assert nodes["C2"].tolist() == ["1", "1", "2"]
+
+    devices = case["substation_switching_device"]
+    assert devices["IS"].tolist() == [1]
+    assert devices["C3"].tolist() == ["BREAKER 1"]
+
+    terminals = case["substation_terminal"]
+    assert terminals["IS"].tolist() == [1, 2, 2]
+    assert terminals["C2"].tolist() == ["M", "L", "B"]
+    assert terminals["C4"].tolist() == ["", "", "1"]
+
+
+def test_chunks_and_workers(tmp_path):
+    path = write_raw(tmp_path, RAW_35)
+    serial = read_raw(path, workers=1)
+    parallel = read_raw(path, workers=2, chunk_records=1)
+    assert sorted(serial.sections) == sorted(parallel.sections)
+    for section, columns in serial.sections.items():
+        for name, column in columns.items():
+            assert parallel[section][name].tolist() == column.tolist(), (section, name)
+
+
+def test_truncated_transformer(tmp_path):
+    text = RAW_33[: RAW_33.index("0.975")]
+    with pytest.raises(RawParseError):
+        read_raw(write_raw(tmp_path, text), workers=1)
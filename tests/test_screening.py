@@ -0,0 +1,202 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from pssepath.screening import DcScreening, winding_branches  # noqa: E402
+
+
+# A meshed 5 bus case, bus 1 is the swing.
+BUSES = [1, 2, 3, 4, 5]
+FROM_BUSES = [1, 1, 2, 2, 3, 4, 3]
+TO_BUSES = [2, 3, 3, 4, 5, 5, 4]
+REACTANCE = [0.06, 0.24, 0.18, 0.18, 0.12, 0.03, 0.01]
+INJECTIONS = [0.0, 40.0, -45.0, -40.0, -60.0]
+RATINGS = [120.0, 60.0, 40.0, 40.0, 50.0, 60.0, 80.0]
+
+
+def dense_ptdf(buses, from_buses, to_buses, reactance, reference=0):
+    """Branch x bus PTDF from the inverse of the dense susceptance matrix."""
+    index = dict((bus, position) for position, bus in enumerate(buses))
+    incidence = np.zeros((len(from_buses), len(buses)))
+    for branch, (from_bus, to_bus) in enumerate(zip(from_buses, to_buses)):
+        incidence[branch, index[from_bus]] = 1.0
+        incidence[branch, index[to_bus]] = -1.0
+    susceptance = np.diag(1.0 / np.asarray(reactance))
+    b_bus = incidence.T.dot(susceptance).dot(incidence)
+    keep = [position for position in range(len(buses)) if position != reference]
+    inverse = np.zeros((len(buses), len(buses)))
+    inverse[np.ix_(keep, keep)] = np.linalg.inv(b_bus[np.ix_(keep, keep)])
+    return susceptance.dot(incidence).dot(inverse), incidence
+
+
+def dense_lodf(ptdf, incidence):
+    transfer = ptdf.dot(incidence.T)
+    lodf = transfer / (1.0 - np.diag(transfer))[None, :]
+    np.fill_diagonal(lodf, -1.0)
+    return lodf
+
+
+def make_screening(flows):
+    return DcScreening(BUSES, [1], FROM_BUSES, TO_BUSES, REACTANCE, flows, RATINGS)
+
+
+def base_flows():
+    ptdf, _ = dense_ptdf(BUSES, FROM_BUSES, TO_BUSES, REACTANCE)
+    return ptdf.dot(INJECTIONS)
+
+
+def test_ptdf_matches_dense():
+    ptdf, incidence = dense_ptdf(BUSES, FROM_BUSES, TO_BUSES, REACTANCE)
+    screening = make_screening(base_flows())
+    outages = np.arange(len(FROM_BUSES))
+    np.testing.assert_allclose(
+        screening.ptdf_columns(outages), ptdf.dot(incidence.T), atol=1e-12
+    )
+
+
+def test_lodf_matches_dense():
+    ptdf, incidence = dense_ptdf(BUSES, FROM_BUSES, TO_BUSES, REACTANCE)
+    screening = make_screening(base_flows())
+    lodf, islanding = screening.lodf_columns(np.arange(len(FROM_BUSES)))
+    np.testing.assert_allclose(lodf, dense_lodf(ptdf, incidence), atol=1e-12)
+    assert not islanding.any()
+
+
+def test_lodf_chunks_match_dense():
+    ptdf, incidence = dense_ptdf(BUSES, FROM_BUSES, TO_BUSES, REACTANCE)
+    screening = make_screening(base_flows())
+    lodf, _ = screening.lodf_columns(np.array([4, 1]))
+    np.testing.assert_allclose(lodf, dense_lodf(ptdf, incidence)[:, [4, 1]], atol=1e-12)
+
+
+def test_screen_matches_resolved_outages():
+    flows = base_flows()
+    results = make_screening(flows).screen(threshold=1.0, chunk_size=3)
+    assert sorted(results["BRANCH"]) == list(range(len(FROM_BUSES)))
+
+    ratings = np.asarray(RATINGS)
+    for row in results:
+        outage = row["BRANCH"]
+        kept = [branch for branch in range(len(FROM_BUSES)) if branch != outage]
+        ptdf, _ = dense_ptdf(
+            BUSES,
+            [FROM_BUSES[branch] for branch in kept],
+            [TO_BUSES[branch] for branch in kept],
+            [REACTANCE[branch] for branch in kept],
+        )
+        post_flows = np.zeros(len(FROM_BUSES))
+        post_flows[kept] = ptdf.dot(INJECTIONS)
+        loading = np.abs(post_flows) / ratings
+        assert row["MAXLOADING"] == pytest.approx(loading.max())
+        assert row["WORSTBRANCH"] == np.argmax(loading)
+        assert row["OVERLOADS"] == np.count_nonzero(loading > 1.0)
+        assert row["FROMNUMBER"] == FROM_BUSES[outage]
+        assert row["TONUMBER"] == TO_BUSES[outage]
+
+    # Riskiest first.
+    assert list(results["MAXLOADING"]) == sorted(results["MAXLOADING"], reverse=True)
+
+
+def test_islanding_outage():
+    # Buses 4 and 5 hang off bus 2 in a line.
+    screening = DcScreening(
+        BUSES,
+        [1],
+        [1, 1, 2, 2, 4],
+        [2, 3, 3, 4, 5],
+        [0.06, 0.24, 0.18, 0.18, 0.03],
+        [10.0, 10.0, 10.0, 10.0, 10.0],
+        [100.0] * 5,
+    )
+    results = screening.screen()
+    assert sorted(results["BRANCH"][:2]) == [3, 4]
+    assert results["ISLANDING"][:2].all()
+    assert not results["ISLANDING"][2:].any()
+
+
+class FakePsspy(object):
+    """Just the psspy array functions DcScreening.from_session() calls."""
+
+    def __init__(self, buses, branches, windings):
+        self.tables = {"abus": buses, "abrn": branches, "awnd": windings}
+
+    def __getattr__(self, name):
+        prefix = name[:4]
+        if prefix not in ("abus", "abrn", "awnd"):
+            raise AttributeError(name)
+        table = self.tables[prefix]
+
+        def array_function(*args):
+            names = args[-1]
+            return 0, [[row[field] for row in table] for field in names]
+
+        return array_function
+
+
+def bus_rows(types):
+    return [dict(NUMBER=bus, TYPE=bus_type) for bus, bus_type in types]
+
+
+def test_from_session_models_three_winding_transformers():
+    buses = bus_rows([(1, 3), (2, 1), (3, 1), (4, 1), (5, 1), (6, 4)])
+    branches = [
+        dict(FROMNUMBER=1, TONUMBER=2, ID="1", STATUS=1, RX=0.01 + 0.06j, P=50.0, RATEA=100.0),
+        dict(FROMNUMBER=1, TONUMBER=3, ID="1", STATUS=1, RX=0.02 + 0.24j, P=20.0, RATEA=60.0),
+        dict(FROMNUMBER=2, TONUMBER=3, ID="1", STATUS=0, RX=0.01 + 0.18j, P=0.0, RATEA=40.0),
+    ]
+    transformer = dict(WIND1NUMBER=2, WIND2NUMBER=4, WIND3NUMBER=5, ID="T1", STATUS=1)
+    windings = [
+        dict(transformer, WNDNUM=1, RX=0.001 + 0.05j, P=30.0, RATEA=90.0),
+        dict(transformer, WNDNUM=2, RX=0.001 + 0.08j, P=-12.0, RATEA=45.0),
+        dict(transformer, WNDNUM=3, RX=0.001 + 0.07j, P=-18.0, RATEA=45.0),
+        # Winding 1 of this one is out of service.
+        dict(
+            WIND1NUMBER=3, WIND2NUMBER=4, WIND3NUMBER=5, ID="T2", STATUS=4,
+            WNDNUM=1, RX=0.001 + 0.05j, P=0.0, RATEA=90.0,
+        ),
+        dict(
+            WIND1NUMBER=3, WIND2NUMBER=4, WIND3NUMBER=5, ID="T2", STATUS=4,
+            WNDNUM=2, RX=0.001 + 0.04j, P=5.0, RATEA=45.0,
+        ),
+        dict(
+            WIND1NUMBER=3, WIND2NUMBER=4, WIND3NUMBER=5, ID="T2", STATUS=4,
+            WNDNUM=3, RX=0.001 + 0.06j, P=-5.0, RATEA=45.0,
+        ),
+    ]
+    psspy = FakePsspy(buses, branches, windings)
+    screening = DcScreening.from_session(psspy, rating="RATEA")
+
+    expected = DcScreening(
+        [1, 2, 3, 4, 5, -2, -1],
+        [1],
+        [1, 1, 2, 4, 5, 4, 5],
+        [2, 3, -1, -1, -1, -2, -2],
+        [0.06, 0.24, 0.05, 0.08, 0.07, 0.04, 0.06],
+        [50.0, 20.0, 30.0, -12.0, -18.0, 5.0, -5.0],
+        [100.0, 60.0, 90.0, 45.0, 45.0, 45.0, 45.0],
+        ["1", "1", "T1", "T1", "T1", "T2", "T2"],
+    )
+    np.testing.assert_array_equal(screening.from_buses, expected.from_buses)
+    np.testing.assert_array_equal(screening.to_buses, expected.to_buses)
+    np.testing.assert_array_equal(screening.ids, expected.ids)
+    outages = np.arange(len(expected.flows))
+    np.testing.assert_allclose(
+        screening.lodf_columns(outages)[0], expected.lodf_columns(outages)[0], atol=1e-12
+    )
+
+
+def test_winding_branches_without_three_winding_transformers():
+    windings = np.zeros(
+        0,
+        dtype=[
+            ("WIND1NUMBER", "i4"),
+            ("WIND2NUMBER", "i4"),
+            ("WIND3NUMBER", "i4"),
+            ("ID", "U40"),
+            ("WNDNUM", "i4"),
+            ("STATUS", "i4"),
+        ],
+    )
+    winding_buses, star_buses, windings = winding_branches(windings)
+    assert len(winding_buses) == len(star_buses) == len(windings) == 0